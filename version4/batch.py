@@ -0,0 +1,103 @@
+# Many games' markets simulated together as one (games x tickers) price matrix.
+# Good for balance studies of the economy tables: the per-turn price moves from hold(), the
+# economy changes from check_eco_status() and the recession shocks from trigger_recession()
+# are all applied to every game at once with array operations. There are no players or
+# investors here, just the markets; use montecarlo.py for full games.
+
+import numpy as np
+
+from engine import DEFAULT_TICKERS, ECONOMIES, RECESSION_SAMPLER, RECESSION_SETTINGS, STANDARD, random_economies
+from rng import RngService
+
+RECESSION_TYPES = RECESSION_SAMPLER.outcomes
+RECESSION_LOW = np.array([RECESSION_SETTINGS[kind][0] for kind in RECESSION_TYPES], dtype=np.float64)
+RECESSION_HIGH = np.array([RECESSION_SETTINGS[kind][1] for kind in RECESSION_TYPES], dtype=np.float64)
+
+
+class BatchMarket:
+    def __init__(self, games, tickers=DEFAULT_TICKERS, seed=None):
+        self.rng = RngService(seed)
+        self.price_rng = self.rng.generator("prices")
+        self.regime_rng = self.rng.generator("regimes")
+        self.recession_rng = self.rng.generator("recessions")
+        self.names = list(tickers)
+        shape = (games, len(self.names))
+        self.turn = 1
+        self.prices = self.price_rng.integers(20, 300, size=shape, endpoint=True).astype(np.float64)
+        self.economy = np.full(shape, STANDARD, dtype=np.int16)
+        self.low = ECONOMIES.low[self.economy]
+        self.high = ECONOMIES.high[self.economy]
+        # The turn each game next changes economies / has a recession, like StockMarketSim's scheduler
+        self.next_economy = self.turn + self.regime_rng.integers(30, 40, size=games, endpoint=True)
+        self.next_recession = self.turn + self.recession_rng.integers(360, 480, size=games, endpoint=True)
+        self.recession_counts = np.zeros((games, len(RECESSION_TYPES)), dtype=np.int64)
+
+    @property
+    def games(self):
+        return self.prices.shape[0]
+
+    def step(self, turns=1):
+        scratch = np.empty_like(self.prices)
+        for _ in range(turns):
+            # hold(): every ticker of every game moves by a random % within its band
+            self.price_rng.random(out=scratch)
+            scratch *= self.high - self.low
+            scratch += self.low
+            scratch /= 100
+            scratch += 1
+            self.prices *= scratch
+            np.round(self.prices, 2, out=self.prices)
+            np.maximum(self.prices, 1.0, out=self.prices)
+            self.turn += 1
+
+            games = np.flatnonzero(self.next_recession == self.turn)
+            if len(games):
+                self.recession(games)
+            games = np.flatnonzero(self.next_economy == self.turn)
+            if len(games):
+                self.change_economy(games)
+        return self.prices
+
+    def recession(self, games):
+        # trigger_recession() for just these games
+        kinds = RECESSION_SAMPLER.indices(self.recession_rng.random(len(games)))
+        np.add.at(self.recession_counts, (games, kinds), 1)
+        low = RECESSION_LOW[kinds][:, None]
+        high = RECESSION_HIGH[kinds][:, None]
+        change_percentage = low + (high - low) * self.price_rng.random((len(games), len(self.names)))
+        prices = self.prices[games] * (1 + change_percentage / 100)
+        self.prices[games] = np.maximum(np.round(prices, 2), 1.0)
+        self.next_recession[games] = self.turn + self.recession_rng.integers(200, 300, size=len(games), endpoint=True)
+
+    def change_economy(self, games):
+        # check_eco_status() for just these games
+        economy = random_economies(self.regime_rng.random((len(games), len(self.names))))
+        self.economy[games] = economy
+        self.low[games] = ECONOMIES.low[economy]
+        self.high[games] = ECONOMIES.high[economy]
+        self.next_economy[games] = self.turn + self.regime_rng.integers(30, 40, size=len(games), endpoint=True)
+
+    def summary(self):
+        return {
+            "games": self.games,
+            "turns": self.turn - 1,
+            "median_price": np.median(self.prices, axis=0),
+            "mean_log_price": np.log(self.prices).mean(axis=0),
+            "recessions_per_game": dict(zip(RECESSION_TYPES, self.recession_counts.mean(axis=0))),
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    market = BatchMarket(10000, seed=1)
+    start = time.perf_counter()
+    market.step(2167)
+    seconds = time.perf_counter() - start
+    ticker_turns = market.games * len(market.names) * (market.turn - 1)
+    print(f"{ticker_turns / seconds / 1e6:.1f} million ticker-turns per second")
+    summary = market.summary()
+    for name, price in zip(market.names, summary["median_price"]):
+        print(f"{name:>10}: median final price ${price:,.2f}")
+    for kind, count in summary["recessions_per_game"].items():
+        print(f"{kind:>16}: {count:.2f} per game")
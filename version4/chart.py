@@ -0,0 +1,132 @@
+# Stock price charts for the game window.
+# LineChart draws straight onto a pygame Surface and remembers how much of the history it has
+# already drawn, so on a normal turn it only adds the new line segments. It only redraws from
+# scratch when the selected stock changes or a price runs off the edge of the current axes.
+# Both charts plot a min/max level-of-detail copy of the history (see lod.py), so they never
+# draw more points than the chart is wide.
+
+import pygame
+
+from lod import LODCache
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+BLUE = (0, 0, 200)
+GRAY = (200, 200, 200)
+
+
+class LineChart:
+    def __init__(self, width=550, height=300, color=BLUE):
+        self.surface = pygame.Surface((width, height))
+        self.plot = pygame.Rect(70, 35, width - 90, height - 75)  # leave room for the labels
+        self.color = color
+        self.font = pygame.font.Font(None, 24)
+        self.small_font = pygame.font.Font(None, 18)
+        self.ticker = None
+        self.drawn = 0  # how many turns of history are already on the surface
+        self.x_start = self.x_end = 0
+        self.y_min = self.y_max = 0
+        self.last_point = None
+        self.lod = LODCache(self.plot.width)
+
+    def to_screen(self, turn, price):
+        x = self.plot.left + (turn - self.x_start) * self.plot.width / (self.x_end - self.x_start)
+        y = self.plot.bottom - (price - self.y_min) * self.plot.height / (self.y_max - self.y_min)
+        return x, y
+
+    def update(self, history, ticker):
+        prices = history[ticker]
+        total = len(history)
+        if total == self.drawn and ticker == self.ticker:
+            return self.surface
+
+        new_prices = prices[len(prices) - min(total - self.drawn, len(prices)):]
+        if (ticker != self.ticker or total > self.x_end or history.start > self.drawn
+                or new_prices.min() < self.y_min or new_prices.max() > self.y_max):
+            self.redraw(history, ticker)
+        else:
+            points = [self.last_point] + [self.to_screen(self.drawn + i, price)
+                                          for i, price in enumerate(new_prices.tolist())]
+            pygame.draw.lines(self.surface, self.color, False, points, 2)
+            self.last_point = points[-1]
+        self.drawn = total
+        return self.surface
+
+    def redraw(self, history, ticker):
+        turns, prices = self.lod.points(history, ticker)
+        self.ticker = ticker
+        # Leave headroom on both axes so the next few turns can be drawn incrementally
+        self.x_start = history.start
+        self.x_end = self.x_start + max(64, len(history[ticker]) * 3 // 2)
+        low, high = float(prices.min()), float(prices.max())
+        pad = max((high - low) * 0.25, high * 0.05, 1.0)
+        self.y_min, self.y_max = max(0.0, low - pad), high + pad
+
+        self.surface.fill(WHITE)
+        self.draw_axes()
+        points = [self.to_screen(turn, price) for turn, price in zip(turns.tolist(), prices.tolist())]
+        if len(points) > 1:
+            pygame.draw.lines(self.surface, self.color, False, points, 2)
+        self.last_point = points[-1]
+
+    def draw_axes(self):
+        pygame.draw.rect(self.surface, BLACK, self.plot, 1)
+        title = self.font.render(f"{self.ticker} Stock Prices", True, BLACK)
+        self.surface.blit(title, ((self.surface.get_width() - title.get_width()) // 2, 8))
+
+        for price in (self.y_min, (self.y_min + self.y_max) / 2, self.y_max):
+            _, y = self.to_screen(self.x_start, price)
+            pygame.draw.line(self.surface, GRAY, (self.plot.left + 1, y), (self.plot.right - 2, y))
+            label = self.small_font.render(f"${price:,.0f}", True, BLACK)
+            self.surface.blit(label, (self.plot.left - label.get_width() - 5, y - label.get_height() // 2))
+
+        for turn in (self.x_start, (self.x_start + self.x_end) // 2, self.x_end):
+            x, _ = self.to_screen(turn, self.y_min)
+            label = self.small_font.render(str(turn), True, BLACK)
+            self.surface.blit(label, (x - label.get_width() // 2, self.plot.bottom + 5))
+        weeks = self.small_font.render("Weeks", True, BLACK)
+        self.surface.blit(weeks, (self.plot.centerx - weeks.get_width() // 2, self.plot.bottom + 20))
+
+
+# The old matplotlib look, for anyone who prefers it. Each ticker gets one figure that is
+# built once and then updated in place with set_data; Agg renders into its own RGBA buffer
+# and pygame wraps that buffer without copying it. matplotlib is only imported if used.
+class MplChart:
+    def __init__(self, width=550, height=300, color="blue", dpi=100):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        self.Figure = Figure
+        self.FigureCanvasAgg = FigureCanvasAgg
+        self.size = (width / dpi, height / dpi)
+        self.dpi = dpi
+        self.color = color
+        self.figures = {}  # ticker -> [canvas, axes, line, turns drawn, surface]
+        self.lod = LODCache(width)
+
+    def figure(self, ticker):
+        if ticker not in self.figures:
+            fig = self.Figure(figsize=self.size, dpi=self.dpi)
+            canvas = self.FigureCanvasAgg(fig)
+            axes = fig.add_subplot()
+            line, = axes.plot([], [], linestyle='-', color=self.color)
+            axes.set_title(f"{ticker} Stock Prices")
+            axes.set_xlabel("Weeks")
+            axes.set_ylabel("Price ($)")
+            fig.tight_layout()
+            self.figures[ticker] = [canvas, axes, line, -1, None]
+        return self.figures[ticker]
+
+    def update(self, history, ticker):
+        cached = self.figure(ticker)
+        canvas, axes, line, drawn, surface = cached
+        if drawn == len(history):
+            return surface
+
+        line.set_data(*self.lod.points(history, ticker))
+        axes.relim()
+        axes.autoscale_view()
+        canvas.draw()
+        buffer = canvas.buffer_rgba()
+        cached[3] = len(history)
+        cached[4] = pygame.image.frombuffer(buffer, canvas.get_width_height(), "RGBA")
+        return cached[4]
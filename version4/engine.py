@@ -0,0 +1,717 @@
+# Headless simulation core for the stock market game.
+# Nothing in here touches pygame or matplotlib, so it can be imported on a box without SDL
+# and stepped as fast as Python allows (batch runs, tests, servers). v4.9.py builds the
+# pygame window on top of StockMarketSim.
+
+import numpy as np
+
+from history import PriceHistory
+from ledger import InvestorLedger, owed_percentages
+from lots import METHODS, LotLedger
+from orders import ORDER_KINDS, OrderBook
+from portfolio import Valuation
+from rng import RngService
+from sampler import AliasSampler
+from scheduler import Scheduler
+
+
+# How far a stock can move per turn (in %) for each economy mode
+ECONOMY_SETTINGS = {
+    "Bad Standard": (-0.45, 0.375),
+    "Good Standard": (-0.025, 0.65),
+    "Standard": (-0.05, 0.35),
+    "Great Upturn": (-0.015, 1.657285),
+    "Ok Upturn": (-0.025, 1.285),
+    "Upturn": (-0.05, 0.785),
+    "Downturn": (-0.005, -1.25),
+    "Good Downturn": (-0.005, -0.7225),
+    "Bank Account == Cooked": (-0.35, -2.25),
+    "TO THE SKY": (0.5, 4.25),
+    "Geopolitical Tensions": (-0.5, -0.55),
+    "Medium": (-0.005, 0.005)
+}
+
+
+# Economy modes are given small integer ids once, at import time. Stocks only ever store the
+# id, and the bands are looked up in a read-only table instead of a dict built every turn.
+class EconomyRegistry:
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.low = np.empty(0)
+        self.high = np.empty(0)
+
+    def __len__(self):
+        return len(self.names)
+
+    def register(self, name, low, high):
+        if name in self.ids:
+            raise ValueError(f"Economy {name!r} is already registered")
+        self.ids[name] = len(self.names)
+        self.names.append(name)
+        # Build new tables rather than growing the old ones, so nobody holding a reference
+        # ever sees them change underneath them
+        self.low = np.append(self.low, float(low))
+        self.high = np.append(self.high, float(high))
+        self.low.setflags(write=False)
+        self.high.setflags(write=False)
+        return self.ids[name]
+
+    def id(self, name):
+        return self.ids[name]
+
+    def bands(self, economy_id):
+        return float(self.low[economy_id]), float(self.high[economy_id])
+
+
+ECONOMIES = EconomyRegistry()
+for _name, (_low, _high) in ECONOMY_SETTINGS.items():
+    ECONOMIES.register(_name, _low, _high)
+STANDARD = ECONOMIES.id("Standard")
+
+
+# How likely each economy is to be picked when the economy changes. Modes with no weight
+# (Upturn, Downturn) are never picked at random.
+ECONOMY_WEIGHTS = {
+    "Standard": 34,
+    "Good Standard": 11,
+    "Bad Standard": 9,
+    "Great Upturn": 11,
+    "Ok Upturn": 10,
+    "Good Downturn": 7,
+    "Bank Account == Cooked": 4,
+    "TO THE SKY": 3,
+    "Geopolitical Tensions": 3,
+    "Medium": 8,
+}
+
+
+def build_economy_sampler():
+    global ECONOMY_SAMPLER, ECONOMY_SAMPLER_IDS
+    ECONOMY_SAMPLER = AliasSampler(ECONOMY_WEIGHTS)
+    ECONOMY_SAMPLER_IDS = np.array([ECONOMIES.id(name) for name in ECONOMY_SAMPLER.outcomes], dtype=np.int16)
+
+
+build_economy_sampler()
+
+
+def random_economies(u):
+    # Economy ids for an array of uniform numbers in [0, 1)
+    return ECONOMY_SAMPLER_IDS[ECONOMY_SAMPLER.indices(u)]
+
+
+# Custom economy modes should be registered at startup, before any markets are created.
+# Give them a weight to have economy changes pick them too.
+def register_economy(name, low, high, weight=0):
+    economy_id = ECONOMIES.register(name, low, high)
+    if weight:
+        ECONOMY_WEIGHTS[name] = weight
+        build_economy_sampler()
+    return economy_id
+
+
+# How far (in %) every stock drops for each kind of recession
+RECESSION_SETTINGS = {
+    "Fake": (-1, 1),
+    "Stock Market Dip": (-3, -25),
+    "Recession": (-30, -40),
+    "Depression": (-50, -60)
+}
+
+
+# How likely each kind of recession is when one is due
+RECESSION_WEIGHTS = {
+    "Fake": 5,
+    "Stock Market Dip": 75,
+    "Recession": 15,
+    "Depression": 5
+}
+RECESSION_SAMPLER = AliasSampler(RECESSION_WEIGHTS)
+
+
+# Order events run in when several land on the same turn
+RECESSION, ECONOMY, INVESTOR_ARRIVAL, INVESTOR_WITHDRAWAL = range(4)
+
+DEFAULT_TICKERS = ["Steel", "Tech", "Food", "Gold", "Aviation", "Cars"]
+
+
+# Every ticker's state lives in flat arrays, so one turn is a single vector operation
+# no matter how many tickers there are
+class Market:
+    # rng: a numpy Generator; if not given one is made from seed
+    def __init__(self, names, seed=None, rng=None):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}  # ticker name -> array slot
+        if len(self.index) != len(self.names):
+            raise ValueError("Ticker names must be unique")
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
+        count = len(self.names)
+        self.prices = self.rng.integers(20, 300, size=count, endpoint=True).astype(np.float64)
+        self.economy = np.full(count, STANDARD, dtype=np.int16)
+        self.low = np.empty(count)
+        self.high = np.empty(count)
+        self.updateLowHigh()
+        self.stocks = [Stock(self, i) for i in range(count)]
+        self.ticks = 0  # bumped whenever prices change, so caches know when to recompute
+
+    def __len__(self):
+        return len(self.names)
+
+    def price(self, name):
+        i = self.index.get(name)
+        if i is None:
+            return None
+        return float(self.prices[i])
+
+    def quote(self, names):
+        # Prices for many tickers in one go, in the order asked for
+        return self.prices[[self.index[name] for name in names]]
+
+    def updateLowHigh(self):
+        # Only needs to run when an economy changes, not every turn
+        np.take(ECONOMIES.low, self.economy, out=self.low)
+        np.take(ECONOMIES.high, self.economy, out=self.high)
+
+    def set_economy(self, index, economy_id):
+        self.economy[index] = economy_id
+        self.low[index] = ECONOMIES.low[economy_id]
+        self.high[index] = ECONOMIES.high[economy_id]
+
+    def move(self, low, high):
+        # Scale every price by a random % between low and high (scalars or per-ticker arrays)
+        change_percentage = low + (high - low) * self.rng.random(len(self.prices))
+        self.prices *= 1 + change_percentage / 100
+        np.round(self.prices, 2, out=self.prices)
+        np.maximum(self.prices, 1.0, out=self.prices)
+        self.ticks += 1
+        return self.prices
+
+    def step(self):
+        return self.move(self.low, self.high)
+
+    def advance(self, turns, record=True, stop=None):
+        # Same as calling step() `turns` times while the economies stay put, but done for the
+        # whole block at once. In log space each turn adds log(1 + change/100) and the $1 floor
+        # is max(0, ...), so the running price is the cumulative sum minus its running minimum
+        # (clamped by the starting price). Prices are only rounded to cents in the recorded
+        # path, not after every turn, so this is NOT the same price process as step(): the
+        # skipped per-turn rounding compounds (most of all near the $1 floor). With the same
+        # seed, 200 tickers in random economies end up to about 0.2% apart after 50 turns,
+        # 1% after 500 and 2.5% after 2000, and nearly every price differs by at least a cent.
+        # Only use it where that doesn't matter (see StockMarketSim's fast_forward); running
+        # this file checks the drift stays inside those bounds.
+        # Returns the per-turn prices as a (turns, tickers) array if record is set.
+        # stop(block) can return the row of a block to finish on (e.g. the first turn that
+        # fills a resting order); the market is left at that turn and the shorter path returned.
+        count = len(self.prices)
+        path = np.empty((turns, count)) if record else None
+        chunk = max(1, (1 << 20) // max(1, count))  # bound the temporary arrays to ~8MB each
+        done = 0
+        while done < turns:
+            k = min(chunk, turns - done)
+            change_percentage = self.low + (self.high - self.low) * self.rng.random((k, count))
+            log_price = np.cumsum(np.log1p(change_percentage / 100), axis=0)
+            floor = np.minimum.accumulate(log_price, axis=0)
+            np.minimum(floor, -np.log(self.prices), out=floor)
+            log_price -= floor
+            block = np.exp(log_price, out=log_price)
+            np.round(block, 2, out=block)
+            row = stop(block) if stop is not None else None
+            if row is not None:
+                k = row + 1
+                block = block[:k]
+            if record:
+                path[done:done + k] = block
+            np.maximum(block[-1], 1.0, out=self.prices)
+            self.ticks += k
+            done += k
+            if row is not None:
+                return path[:done] if record else None
+        return path
+
+
+# A single ticker; reads and writes go straight through to the Market arrays
+class Stock:
+    def __init__(self, market, index):
+        self.market = market
+        self.index = index
+        self.name = market.names[index]
+
+    @property
+    def price(self):
+        return float(self.market.prices[self.index])
+
+    @price.setter
+    def price(self, value):
+        self.market.prices[self.index] = value
+        self.market.ticks += 1
+
+    @property
+    def low(self):
+        return float(self.market.low[self.index])
+
+    @property
+    def high(self):
+        return float(self.market.high[self.index])
+
+    @property
+    def economy_id(self):
+        return int(self.market.economy[self.index])
+
+    @economy_id.setter
+    def economy_id(self, economy_id):
+        self.market.set_economy(self.index, economy_id)
+
+    @property
+    def economy(self):
+        return ECONOMIES.names[self.market.economy[self.index]]
+
+    @economy.setter
+    def economy(self, economy_name):
+        self.market.set_economy(self.index, ECONOMIES.id(economy_name))
+
+
+# All of the game rules, without any drawing
+class StockMarketSim:
+    # history_window: turns of full-resolution price history kept per ticker (see history.py)
+    # fast_forward: jump quiet stretches with Market.advance instead of stepping every turn.
+    # Much faster for batch runs, but prices drift slightly from the turn-by-turn game.
+    def __init__(self, verbose=False, tickers=DEFAULT_TICKERS, seed=None, history_window=1024, fast_forward=False):
+        self.verbose = verbose  # print economy changes to the console
+        self.fast_forward = fast_forward
+        self.cash = 10000
+        self.portfolio = {}
+        self.avg_buy_price = {}  # cost basis per share of what's still held (from self.lots)
+        self.rng = RngService(seed)  # self.rng.seed replays the same game
+        self.regime_rng = self.rng.stream("regimes")
+        self.recession_rng = self.rng.stream("recessions")
+        self.investor_rng = self.rng.stream("investors")
+        self.market = Market(tickers, rng=self.rng.generator("prices"))
+        self.stocks = self.market.stocks
+        self.valuation = Valuation(self.market)  # cached market value / P&L of self.portfolio
+        self.lots = LotLedger(self.market.names)  # every buy as its own lot, see lots.py
+        self.lot_method = "fifo"  # which lots sells come out of: "fifo" or "lifo"
+        self.historical_prices = PriceHistory(self.market.names, self.market.prices, window=history_window)
+        self.turn = 1
+        self.irs_percentage = 0
+        self.selected_stock = None
+        self.message = ""
+        self.orders = OrderBook(self.market.names)  # resting limit / stop orders, see orders.py
+        # Recessions, economy changes and investors each book the turn they next need to run on
+        self.scheduler = Scheduler()
+        self.scheduler.schedule(self.turn + self.recession_rng.randint(360, 480), self.check_recession, RECESSION)
+        self.scheduler.schedule(self.turn + self.regime_rng.randint(30, 40), self.check_eco_status, ECONOMY)
+
+        # Investor-related attributes
+        self.investors = InvestorLedger()  # see ledger.py
+        self.withdrawal_event = None  # one scheduler entry for whoever withdraws next
+        self.investor_names = ["Alice", "Bob", "Charlie", "David", "Eve", "Frank"]  # List of investor names
+        self.scheduler.schedule(self.turn + self.investor_rng.randint(50, 150), self.handle_investors, INVESTOR_ARRIVAL)
+        self.investor_waiting = False  # an investor is ready to join as soon as there is room
+        self.base_investment_amount = 10000  # Base investment amount
+        self.max_investors = 5  # Maximum number of investors allowed
+        self.clients_numbered = 0  # investors named "Client N" once investor_names runs out
+        self.percentage = 0
+        self.events = 0  # bumped whenever something newsworthy happens (see run_until_event)
+        self.recession_counts = {}  # recession type -> times it has hit
+
+    def is_game_over(self):
+        return self.irs_percentage >= 100
+
+    def step(self, turns=1, stop_on_event=False):
+        # Advance the simulation without any frame clock; stops early on game over, and after
+        # the first event if stop_on_event is set. With fast_forward, turns with nothing
+        # scheduled are done as one block price update.
+        end = self.turn + turns
+        events = self.events
+        while self.turn < end and not self.is_game_over():
+            quiet = min(end, self.scheduler.next_turn(default=end)) - self.turn - 1
+            if quiet > 0 and self.fast_forward:
+                self.quiet_turns(quiet)
+            else:
+                self.hold(True)
+            if stop_on_event and self.events != events:
+                break
+        return self.turn
+
+    def run_until_event(self, max_turns=1000):
+        # Fast-forward until an economy change, recession or investor move happens.
+        # Returns True if it stopped because of an event (or game over), False if it ran out of turns.
+        events = self.events
+        self.step(max_turns, stop_on_event=True)
+        return self.events != events or self.is_game_over()
+
+    def quiet_turns(self, turns):
+        # Turns where nothing is scheduled: only prices move, so do them all in one block.
+        # With orders resting, the block ends early on the first turn that reaches one.
+        stop = self.orders.first_crossing if self.orders else None
+        path = self.market.advance(turns, stop=stop)
+        self.historical_prices.extend(path)
+        self.turn += len(path)
+        self.match_orders()
+
+    def buy_stock(self, shares_to_buy):
+        if not self.selected_stock:
+            self.message = "No stock selected!"
+            return
+
+        try:
+            shares_to_buy = int(shares_to_buy)
+            if shares_to_buy <= 0:
+                self.message = "Invalid number of shares!"
+                return
+        except ValueError:
+            self.message = "Invalid number of shares!"
+            return
+
+        stock_price = self.findStockPrice(self.selected_stock)
+        cost = shares_to_buy * stock_price
+
+        if cost > self.cash:
+            self.message = "Not enough cash!"
+            return
+
+        self.apply_fill(self.selected_stock, shares_to_buy, stock_price)
+        self.message = f"Bought {shares_to_buy} shares of {self.selected_stock} for ${cost:.2f}"
+
+    def execute_batch(self, orders):
+        # Market orders for a whole basket at once: orders is a list of (ticker, side, shares)
+        # with side "buy" or "sell". Everything is priced from one snapshot and checked
+        # together (sells in the basket help pay for its buys); either every order goes
+        # through or none does. Returns True if the basket was traded.
+        tickers = []
+        shares = []
+        for order in orders:
+            try:
+                stock, side, qty = order
+                qty = int(qty)
+            except (TypeError, ValueError, OverflowError):  # OverflowError: int(float("inf"))
+                self.message = f"Invalid order: {order!r}"
+                return False
+            if stock not in self.market.index:
+                self.message = f"Unknown stock: {stock}"
+                return False
+            if side not in ("buy", "sell") or qty <= 0:
+                self.message = f"Invalid order: {order!r}"
+                return False
+            tickers.append(self.market.index[stock])
+            shares.append(qty if side == "buy" else -qty)
+        if not tickers:
+            self.message = "No orders!"
+            return False
+
+        # Net shares per ticker, priced once
+        net = np.zeros(len(self.market), dtype=np.int64)
+        np.add.at(net, tickers, shares)
+        prices = self.market.prices.copy()
+        held = self.valuation.shares()
+        short = np.flatnonzero(held + net < 0)
+        if len(short):
+            self.message = f"Not enough shares of {self.market.names[short[0]]} to sell!"
+            return False
+        cost = float(net @ prices)
+        if cost > self.cash:
+            self.message = "Not enough cash for this basket!"
+            return False
+
+        for i in np.flatnonzero(net).tolist():
+            self.apply_fill(self.market.names[i], int(net[i]), float(prices[i]))
+        bought = float(np.maximum(net, 0) @ prices)
+        sold = bought - cost
+        self.message = f"Traded {len(tickers)} orders: bought ${bought:.2f}, sold ${sold:.2f}"
+        return True
+
+    def rebalance(self, targets):
+        # Trade to the given allocation: targets is {ticker: % of net worth}, anything left out
+        # is 0% and whatever doesn't add up to 100% stays in cash. Works out the whole-share
+        # trades for every ticker at once and sends them as one batch (see execute_batch).
+        weights = np.zeros(len(self.market))
+        for stock, percent in targets.items():
+            if stock not in self.market.index:
+                self.message = f"Unknown stock: {stock}"
+                return False
+            try:
+                weights[self.market.index[stock]] = float(percent)
+            except (TypeError, ValueError):
+                self.message = f"Invalid weight for {stock}: {percent!r}"
+                return False
+        # Weights like 100/6 each can add up to a hair over 100 from float rounding
+        if not np.isfinite(weights).all() or (weights < 0).any() or weights.sum() > 100 + 1e-9:
+            self.message = "Target weights must be numbers, not negative, and add up to at most 100%!"
+            return False
+        if weights.sum() > 100:
+            weights *= 100 / weights.sum()  # so the floored targets still fit in cash
+
+        prices = self.market.prices
+        held = self.valuation.shares()
+        net_worth = self.net_worth()
+        target = np.floor(net_worth * weights / 100 / prices).astype(np.int64)  # never more than we can pay for
+        delta = target - held
+        trades = [(self.market.names[i], "buy" if delta[i] > 0 else "sell", abs(int(delta[i])))
+                  for i in np.flatnonzero(delta).tolist()]
+        if not trades:
+            self.message = "Portfolio already on target!"
+            return True
+        return self.execute_batch(trades)
+
+    def findStockPrice(self, selected_stock):
+        return self.market.price(selected_stock)
+
+    def quote(self, stock_names):
+        return dict(zip(stock_names, self.market.quote(stock_names).tolist()))
+
+    def sell_stock(self, shares_to_sell, lot_ids=None):
+        # lot_ids: sell out of these particular lots (see self.lots.lots) instead of by lot_method
+        if not self.selected_stock or self.selected_stock not in self.portfolio:
+            self.message = "No stock selected or no shares owned!"
+            return
+        try:
+            shares_to_sell = int(shares_to_sell)
+            if shares_to_sell <= 0:
+                self.message = "Invalid number of shares!"
+                return
+        except ValueError:
+            self.message = "Invalid number of shares!"
+            return
+
+        if shares_to_sell > self.portfolio[self.selected_stock]:
+            self.message = "Not enough shares to sell!"
+            return
+
+        selected_stock_price = self.findStockPrice(self.selected_stock)
+        try:
+            revenue = self.apply_fill(self.selected_stock, -shares_to_sell, selected_stock_price, lot_ids)
+        except ValueError as error:
+            self.message = str(error)
+            return
+
+        self.message = f"Sold {shares_to_sell} shares of {self.selected_stock} for ${revenue:.2f}"
+
+    def hold(self, play):
+        if play:
+            self.historical_prices.append(self.market.step())
+            self.turn += 1
+            self.match_orders()
+            self.scheduler.run_due(self.turn)
+
+    def place_order(self, kind, shares, trigger, stock=None):
+        # Rest an order on the book until the price reaches `trigger`. kind is one of
+        # ORDER_KINDS; stock defaults to the selected one. Returns the Order, or None.
+        stock = stock or self.selected_stock
+        if not stock:
+            self.message = "No stock selected!"
+            return None
+        if stock not in self.market.index:
+            self.message = f"Unknown stock: {stock}"
+            return None
+        if kind not in ORDER_KINDS:
+            self.message = f"Unknown order type: {kind}"
+            return None
+        try:
+            shares = int(shares)
+            trigger = round(float(trigger), 2)
+            if shares <= 0 or not np.isfinite(trigger) or trigger <= 0:
+                self.message = "Invalid order!"
+                return None
+        except (TypeError, ValueError, OverflowError):  # OverflowError: int(float("inf"))
+            self.message = "Invalid order!"
+            return None
+        order = self.orders.place(stock, kind, shares, trigger, self.turn)
+        self.message = f"Placed {kind} for {shares} shares of {stock} at ${trigger:.2f}"
+        return order
+
+    def cancel_order(self, order_id):
+        if self.orders.cancel(order_id):
+            self.message = f"Cancelled order #{order_id}"
+            return True
+        self.message = "No such order!"
+        return False
+
+    def match_orders(self):
+        # Fill whatever the latest price move reached; only crossed price levels are touched
+        if not self.orders:
+            return
+        for order in self.orders.match(self.market.prices):
+            self.fill_order(order)
+
+    def fill_order(self, order):
+        # Orders fill at the turn's price, which may be past the trigger if the price jumped it
+        price = self.findStockPrice(order.ticker)
+        self.events += 1
+        if order.side == "buy" and order.shares * price > self.cash:
+            self.message = f"Not enough cash to fill {order.kind} on {order.ticker}!"
+            return False
+        if order.side == "sell" and order.shares > self.portfolio.get(order.ticker, 0):
+            self.message = f"Not enough {order.ticker} shares to fill {order.kind}!"
+            return False
+        shares = order.shares if order.side == "buy" else -order.shares
+        amount = self.apply_fill(order.ticker, shares, price)
+        verb = "Bought" if order.side == "buy" else "Sold"
+        self.message = f"{order.kind.capitalize()} filled: {verb} {order.shares} shares of {order.ticker} for ${amount:.2f}"
+        return True
+
+    def apply_fill(self, stock, shares, price, lot_ids=None):
+        # Every trade goes through here. Books it at `price`: shares > 0 buys a new lot,
+        # shares < 0 sells out of the lots by lot_method (or the lots in lot_ids). The caller
+        # has already checked there is enough cash / shares; a bad lot_ids raises ValueError
+        # before anything changes. Returns the cash that changed hands.
+        if self.lot_method not in METHODS:
+            raise ValueError(f"Unknown lot method: {self.lot_method}")
+        amount = shares * price
+        if shares > 0:
+            self.lots.buy(stock, self.turn, shares, price)
+        else:
+            self.lots.sell(stock, -shares, price, self.lot_method, lot_ids)
+        self.cash -= amount
+        held = self.portfolio.get(stock, 0)
+        if held + shares == 0:
+            del self.portfolio[stock]
+        else:
+            self.portfolio[stock] = held + shares
+            self.avg_buy_price[stock] = self.lots.average_price(stock)
+        self.position_changed(stock)
+        return abs(amount)
+
+    def position_changed(self, stock):
+        self.valuation.set_position(stock, self.portfolio.get(stock, 0), self.avg_buy_price.get(stock, 0))
+
+    def net_worth(self):
+        return self.cash + self.valuation.market_value
+
+    def realized_gains(self):
+        # Profit (or loss) locked in by sells so far, against the lots they came out of
+        return self.lots.realized_total()
+
+    def check_eco_status(self, turn):
+        self.events += 1
+        self.market.economy[:] = random_economies(self.regime_rng.array(len(self.market)))
+        self.market.updateLowHigh()
+        if self.verbose:
+            for s in self.stocks:
+                print(f"{s.name}: {s.economy}")
+
+        self.scheduler.schedule(turn + self.regime_rng.randint(30, 40), self.check_eco_status, ECONOMY)
+
+    def get_percent_change(self, stock_name):
+        if stock_name not in self.avg_buy_price:
+            return 0
+        current_price = self.findStockPrice(stock_name)
+        avg_price = self.avg_buy_price[stock_name]
+        if avg_price == 0:
+            return 0
+        return ((current_price - avg_price) / avg_price) * 100
+
+    def check_recession(self, turn):
+        self.trigger_recession(RECESSION_SAMPLER.draw(self.recession_rng))
+        self.scheduler.schedule(turn + self.recession_rng.randint(200, 300), self.check_recession, RECESSION)
+
+    def trigger_recession(self, recession_type):
+        settings = RECESSION_SETTINGS[recession_type]
+        self.events += 1
+        self.recession_counts[recession_type] = self.recession_counts.get(recession_type, 0) + 1
+        if recession_type == "Standard":
+            self.message = f"{recession_type} Occurs! Stock Prices Drop!"
+        elif recession_type == "Recession":
+            self.message = f"{recession_type} Hits! Stock Prices Drop!"
+        elif recession_type == "Depression":
+            self.message = f"{recession_type} Hits! Stock Prices Drop! (Emotional Damage... your bank account is worth as much as a cabbage)"
+        elif recession_type == "Fake":
+            self.message = f"Get trolled"
+
+        # Apply a significant negative change to stock prices
+        self.market.move(settings[0], settings[1])
+        self.match_orders()  # a crash can set off stop-losses and limit buys
+
+    def handle_investors(self, turn):
+        if len(self.investors) < self.max_investors:
+            self.add_investor()
+            self.scheduler.schedule(turn + self.investor_rng.randint(10, 20), self.handle_investors, INVESTOR_ARRIVAL)
+        else:
+            self.investor_waiting = True  # comes in the turn after someone leaves
+
+    def schedule_withdrawals(self, slots, after_turn):
+        # Draw when these investors next try to withdraw, then make sure the scheduler wakes us
+        # for whoever is first. Only that one entry is ever booked, however many investors there are.
+        self.investors.draw_withdrawals(slots, after_turn, self.investor_rng)
+        next_turn = self.investors.next_turn()
+        if self.withdrawal_event is not None:
+            if self.withdrawal_event[0] == next_turn:
+                return
+            self.scheduler.cancel(self.withdrawal_event)
+            self.withdrawal_event = None
+        if next_turn is not None:
+            self.withdrawal_event = self.scheduler.schedule(next_turn, self.handle_withdrawals, INVESTOR_WITHDRAWAL)
+
+    def handle_withdrawals(self, turn):
+        self.withdrawal_event = None
+        self.investors.refresh(turn)
+        unpaid = [slot for slot in self.investors.due(turn) if not self.withdraw(slot, turn)]
+        self.schedule_withdrawals(unpaid, turn)
+
+    def withdraw(self, slot, turn):
+        investor = self.investors.names[slot]
+        years_invested = self.investors.years_invested(slot, turn)
+        owed_amount = float(self.investors.owed[slot])
+
+        self.events += 1
+        if self.cash >= owed_amount:
+            self.cash -= owed_amount
+            self.investors.remove(slot)
+            self.message = f"{investor} withdrew ${owed_amount:.2f} after {years_invested} years."
+            if self.irs_percentage - 1 < 0:
+                self.irs_percentage = 0
+            else:
+                self.irs_percentage -= 1
+            if self.investor_waiting:
+                self.investor_waiting = False
+                self.scheduler.schedule(turn + 1, self.handle_investors, INVESTOR_ARRIVAL)
+            return True
+        else:
+            self.message = f"Not enough cash to pay {investor}!"
+            self.irs_percentage +=0.2
+            return False
+
+    def add_investor(self):
+        available_investors = [name for name in self.investor_names if name not in self.investors]
+        if available_investors or self.max_investors > len(self.investor_names):
+            if available_investors:
+                investor_name = self.investor_rng.choice(available_investors)
+            else:
+                # Out of names (a big client list): number the rest
+                self.clients_numbered += 1
+                investor_name = f"Client {self.clients_numbered}"
+            investment_amount = self.base_investment_amount * self.investor_rng.uniform(0.8, 1.5)  # Vary the amount
+            slot = self.investors.add(investor_name, investment_amount, self.turn)
+            self.schedule_withdrawals([slot], self.turn)
+            self.cash += investment_amount
+            self.events += 1
+            self.message = f"{investor_name} invested ${investment_amount:.2f}!"
+
+    def calculate_owed_percentage(self, years):
+        return float(owed_percentages(years))  # the table lives in ledger.py
+
+
+if __name__ == "__main__":
+    # How far Market.advance drifts from stepping turn by turn; the bounds are the ones
+    # quoted in Market.advance
+    names = [f"T{i}" for i in range(200)]
+    for turns, bound in ((50, 0.002), (500, 0.01), (2000, 0.025)):
+        worst = 0.0
+        for seed in range(5):
+            block, stepped = Market(names, seed=seed), Market(names, seed=seed)
+            economies = np.random.default_rng(seed).integers(0, len(ECONOMIES.names), len(names))
+            for market in (block, stepped):
+                market.economy[:] = economies
+                market.updateLowHigh()
+            block.advance(turns, record=False)
+            for _ in range(turns):
+                stepped.step()
+            worst = max(worst, float((np.abs(block.prices - stepped.prices) / stepped.prices).max()))
+        print(f"{turns:>5} turns: up to {worst:.3%} apart")
+        assert worst <= bound, f"advance drifted {worst:.3%} after {turns} turns (documented {bound:.1%})"
+
+    # An equal split adds up to a hair over 100% in floats and must still be accepted
+    game = StockMarketSim(seed=1)
+    assert game.rebalance({name: 100 / 6 for name in game.market.names}), game.message
+    assert game.cash >= 0 and len(game.portfolio) == len(game.market.names)
+    print("equal-weight rebalance ok")
@@ -0,0 +1,94 @@
+# Price history for every ticker, kept in fixed-size NumPy ring buffers.
+# Memory stays flat no matter how long the game runs, and older prices are kept at lower
+# resolution in archive tiers instead of being thrown away.
+
+import numpy as np
+
+
+# One row per ticker. Every value is written twice, at slot p and slot p + capacity, so the
+# last `capacity` values are always one contiguous slice and reading them never copies.
+class Ring:
+    def __init__(self, tickers, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self.data = np.zeros((tickers, 2 * capacity), dtype=dtype)
+        self.count = 0  # values ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def start(self):
+        # How many values have fallen off the front
+        return self.count - len(self)
+
+    def append(self, values):
+        slot = self.count % self.capacity
+        self.data[:, slot] = values
+        self.data[:, slot + self.capacity] = values
+        self.count += 1
+
+    def extend(self, block):
+        # block is (turns, tickers); only the last `capacity` turns can still be in the ring
+        turns = len(block)
+        keep = block[-self.capacity:].T
+        slots = (self.count + turns - keep.shape[1] + np.arange(keep.shape[1])) % self.capacity
+        self.data[:, slots] = keep
+        self.data[:, slots + self.capacity] = keep
+        self.count += turns
+
+    def row(self, i):
+        end = (self.count - 1) % self.capacity + 1 + self.capacity
+        return self.data[i, end - len(self):end]
+
+
+class PriceHistory:
+    # window: how many turns are kept at full resolution
+    # tiers: (every, capacity) pairs; one price out of every `every` turns is archived
+    def __init__(self, names, first_prices, window=1024, tiers=((10, 520), (100, 520)), dtype=np.float64):
+        self.index = {name: i for i, name in enumerate(names)}
+        self.recent = Ring(len(self.index), window, dtype)
+        self.tiers = [(every, Ring(len(self.index), capacity, dtype)) for every, capacity in tiers]
+        self.append(first_prices)
+
+    def __len__(self):
+        return self.recent.count
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        # Read-only view of the recent window for one ticker, oldest first
+        return self.series(name)
+
+    @property
+    def start(self):
+        # Turn number (counting from 0) of the oldest price still in the recent window
+        return self.recent.start
+
+    def append(self, prices):
+        self.recent.append(prices)
+        for every, ring in self.tiers:
+            if (self.recent.count - 1) % every == 0:
+                ring.append(prices)
+
+    def extend(self, block):
+        # Many turns at once, oldest first: block[t] is the price of every ticker on turn t
+        first = self.recent.count
+        self.recent.extend(block)
+        for every, ring in self.tiers:
+            offset = -first % every  # first row of the block that lands on an archive turn
+            if offset < len(block):
+                ring.extend(block[offset::every])
+
+    def series(self, name):
+        values = self.recent.row(self.index[name])
+        values.flags.writeable = False
+        return values
+
+    def archive(self, name, tier=0):
+        # Returns (first_turn, every, prices) for one archive tier, oldest first;
+        # prices[k] is the price at turn first_turn + k * every
+        every, ring = self.tiers[tier]
+        values = ring.row(self.index[name])
+        values.flags.writeable = False
+        return ring.start * every, every, values
@@ -0,0 +1,125 @@
+# Investors kept as columns of NumPy arrays instead of a dict of tuples, so the game can look
+# after thousands of them (the stock-broker idea in ideas.txt).
+# What an investor is owed only changes on their anniversary, so it's worked out once a year
+# and cached; the portfolio screen just reads the cache. The turn each investor next tries to
+# withdraw is drawn for everyone who needs one in one go.
+
+import numpy as np
+
+TURNS_PER_YEAR = 52
+NEVER = np.iinfo(np.int64).max  # next_withdrawal for empty slots
+
+
+def owed_percentages(years):
+    # Extra owed on top of the original investment after `years` years (array or number)
+    return np.where(years >= 7, 1.40, np.where(years >= 5, 1.20, 0.0))
+
+
+class InvestorLedger:
+    def __init__(self, capacity=8):
+        self.names = [None] * capacity  # slot -> investor name
+        self.slots = {}  # investor name -> slot
+        self.free = list(range(capacity - 1, -1, -1))  # empty slots, lowest popped first
+        self.amount = np.zeros(capacity)  # initial investment
+        self.start_turn = np.zeros(capacity, dtype=np.int64)
+        self.owed = np.zeros(capacity)  # cached amount owed ...
+        self.owed_until = np.zeros(capacity, dtype=np.int64)  # ... good until this turn (next anniversary)
+        self.next_withdrawal = np.full(capacity, NEVER, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, name):
+        return name in self.slots
+
+    def __iter__(self):
+        return iter(list(self.slots))
+
+    def items(self):
+        # Same shape as the old {name: (initial_investment, start_turn)} dict
+        for name, slot in self.slots.items():
+            yield name, (float(self.amount[slot]), int(self.start_turn[slot]))
+
+    def grow(self):
+        old = len(self.names)
+        new = old * 2
+        self.names.extend([None] * old)
+        self.free = list(range(new - 1, old - 1, -1)) + self.free
+        for field in ("amount", "start_turn", "owed", "owed_until", "next_withdrawal", "active"):
+            array = getattr(self, field)
+            grown = np.empty(new, dtype=array.dtype)
+            grown[:old] = array
+            grown[old:] = NEVER if field == "next_withdrawal" else 0
+            setattr(self, field, grown)
+
+    def add(self, name, amount, turn):
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.names[slot] = name
+        self.slots[name] = slot
+        self.amount[slot] = amount
+        self.start_turn[slot] = turn
+        self.owed[slot] = amount
+        self.owed_until[slot] = turn + TURNS_PER_YEAR
+        self.next_withdrawal[slot] = NEVER
+        self.active[slot] = True
+        return slot
+
+    def remove(self, slot):
+        del self.slots[self.names[slot]]
+        self.names[slot] = None
+        self.active[slot] = False
+        self.next_withdrawal[slot] = NEVER
+        self.free.append(slot)
+
+    def refresh(self, turn):
+        # Recompute the owed amount of anyone who has had an anniversary since it was cached
+        stale = np.flatnonzero(self.active & (self.owed_until <= turn))
+        if len(stale):
+            years = (turn - self.start_turn[stale]) // TURNS_PER_YEAR
+            self.owed[stale] = self.amount[stale] * (1 + owed_percentages(years))
+            self.owed_until[stale] = self.start_turn[stale] + TURNS_PER_YEAR * (years + 1)
+
+    def owed_amounts(self, turn):
+        # [(name, amount owed)] for everyone, in the order they joined
+        self.refresh(turn)
+        slots = list(self.slots.values())
+        return list(zip(self.slots, self.owed[slots].tolist()))
+
+    def years_invested(self, slot, turn):
+        return int(turn - self.start_turn[slot]) // TURNS_PER_YEAR
+
+    def draw_withdrawals(self, slots, after_turn, stream):
+        # Every turn an investor has a (years invested)% chance of withdrawing. Rather than roll
+        # for it every turn, roll how many turns until the roll first succeeds (a geometric
+        # draw). The chance only changes on the investor's anniversary, so anyone whose draw
+        # lands past theirs starts again from the anniversary with the new chance.
+        slots = np.asarray(slots, dtype=np.intp)
+        turn = np.full(len(slots), after_turn, dtype=np.int64)
+        pending = np.arange(len(slots))
+        while len(pending):
+            start = self.start_turn[slots[pending]]
+            years = (turn[pending] + 1 - start) // TURNS_PER_YEAR
+            next_anniversary = start + TURNS_PER_YEAR * (years + 1)
+            chance = np.minimum(years * 0.01, 1.0)  # 1% increase per year
+            u = stream.array(len(pending))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                wait = np.floor(np.log1p(-u) / np.log1p(-chance))  # 0 once the chance is 100%
+            attempt = np.where(chance > 0, turn[pending] + 1 + wait, next_anniversary).astype(np.int64)
+            done = attempt < next_anniversary
+            self.next_withdrawal[slots[pending[done]]] = attempt[done]
+            turn[pending[~done]] = next_anniversary[~done] - 1
+            pending = pending[~done]
+
+    def next_turn(self):
+        # Earliest withdrawal attempt of anyone, or None
+        if not self.slots:
+            return None
+        return int(self.next_withdrawal.min())
+
+    def due(self, turn):
+        # Slots trying to withdraw on or before `turn`, earliest first
+        slots = np.flatnonzero(self.next_withdrawal <= turn)
+        return slots[np.argsort(self.next_withdrawal[slots], kind="stable")].tolist()
@@ -0,0 +1,116 @@
+# Level-of-detail for long price histories.
+# After a few hundred turns there are more prices than pixels across the chart. MinMaxLOD
+# groups turns into buckets and keeps only the lowest and highest price of each one, so a
+# crash or a spike always survives. It never holds more than max_points points: when it fills
+# up, neighbouring buckets are merged and the bucket size doubles. New turns are folded into
+# the last bucket one at a time, so keeping it up to date is cheap.
+
+import numpy as np
+
+
+class MinMaxLOD:
+    def __init__(self, max_points):
+        self.max_buckets = max(1, max_points // 2)  # each bucket draws as up to 2 points
+        self.bucket_size = 1
+        size = 2 * self.max_buckets + 2
+        self.first = np.zeros(size, dtype=np.int64)  # first turn covered by each bucket
+        self.low = np.zeros(size)
+        self.low_turn = np.zeros(size, dtype=np.int64)
+        self.high = np.zeros(size)
+        self.high_turn = np.zeros(size, dtype=np.int64)
+        self.buckets = 0
+        self.next_turn = None  # turn number of the next price to be added
+        self.cached = None
+
+    def add(self, first_turn, prices):
+        if self.next_turn is None:
+            self.next_turn = first_turn
+        for price in prices.tolist():
+            turn = self.next_turn
+            b = self.buckets - 1
+            if b < 0 or turn >= self.first[b] + self.bucket_size:
+                if self.buckets == len(self.first):
+                    self.merge()
+                b = self.buckets
+                self.buckets += 1
+                self.first[b] = turn - turn % self.bucket_size
+                self.low[b] = self.high[b] = price
+                self.low_turn[b] = self.high_turn[b] = turn
+            elif price < self.low[b]:
+                self.low[b], self.low_turn[b] = price, turn
+            elif price > self.high[b]:
+                self.high[b], self.high_turn[b] = price, turn
+            self.next_turn += 1
+        while self.buckets > self.max_buckets:
+            self.merge()
+        self.cached = None
+
+    def merge(self):
+        # Halve the number of buckets by joining neighbours that share a doubled bucket
+        self.bucket_size *= 2
+        n = self.buckets
+        group = self.first[:n] // self.bucket_size
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        low_pick = starts + np.array([np.argmin(self.low[s:e]) for s, e in zip(starts, np.r_[starts[1:], n])])
+        high_pick = starts + np.array([np.argmax(self.high[s:e]) for s, e in zip(starts, np.r_[starts[1:], n])])
+        m = len(starts)
+        self.low[:m], self.low_turn[:m] = self.low[low_pick], self.low_turn[low_pick]
+        self.high[:m], self.high_turn[:m] = self.high[high_pick], self.high_turn[high_pick]
+        self.first[:m] = group[starts] * self.bucket_size
+        self.buckets = m
+
+    def drop_before(self, turn, prices):
+        # Forget everything before `turn` (the history window has moved on); prices are the
+        # retained prices from `turn` onwards
+        keep = np.flatnonzero(self.first[:self.buckets] + self.bucket_size > turn)
+        if len(keep) and keep[0] > 0:
+            m = len(keep)
+            for column in (self.first, self.low, self.low_turn, self.high, self.high_turn):
+                column[:m] = column[keep]
+            self.buckets = m
+            self.cached = None
+        # The oldest bucket can straddle `turn`; if its low or high is from before then, work
+        # it out again from the part that is still kept
+        if self.buckets and self.first[0] < turn and min(self.low_turn[0], self.high_turn[0]) < turn:
+            part = prices[:self.first[0] + self.bucket_size - turn]
+            low, high = int(np.argmin(part)), int(np.argmax(part))
+            self.low[0], self.low_turn[0] = part[low], turn + low
+            self.high[0], self.high_turn[0] = part[high], turn + high
+            self.cached = None
+
+    def points(self):
+        # (turns, prices) ready to plot, in time order
+        if self.cached is None:
+            n = self.buckets
+            low_first = self.low_turn[:n] <= self.high_turn[:n]
+            turns = np.empty((n, 2), dtype=np.int64)
+            prices = np.empty((n, 2))
+            turns[:, 0] = np.where(low_first, self.low_turn[:n], self.high_turn[:n])
+            turns[:, 1] = np.where(low_first, self.high_turn[:n], self.low_turn[:n])
+            prices[:, 0] = np.where(low_first, self.low[:n], self.high[:n])
+            prices[:, 1] = np.where(low_first, self.high[:n], self.low[:n])
+            turns, prices = turns.ravel(), prices.ravel()
+            if self.bucket_size == 1:
+                turns, prices = turns[::2], prices[::2]  # one price per bucket, no need to double it
+            self.cached = turns, prices
+        return self.cached
+
+
+# One MinMaxLOD per ticker, brought up to date from a PriceHistory on demand
+class LODCache:
+    def __init__(self, max_points):
+        self.max_points = max_points
+        self.lods = {}
+
+    def points(self, history, ticker):
+        lod = self.lods.get(ticker)
+        prices = history[ticker]
+        total = len(history)
+        if lod is None or lod.next_turn is None or total - lod.next_turn > len(prices):
+            # New ticker, or we fell behind the retention window: start over from what is kept
+            lod = self.lods[ticker] = MinMaxLOD(self.max_points)
+            lod.add(history.start, prices)
+        elif total > lod.next_turn:
+            lod.add(lod.next_turn, prices[len(prices) - (total - lod.next_turn):])
+            lod.drop_before(history.start, prices)
+        return lod.points()
@@ -0,0 +1,152 @@
+# Cost basis kept lot by lot instead of as one blended average price.
+# Every buy adds a row (turn, shares, price) to its ticker's NumPy array; sells take shares
+# off the oldest lots first (FIFO), the newest (LIFO) or the particular lots asked for, and
+# work out the realized gain from just the rows they touch. Running totals of shares and cost
+# per ticker mean the average price never needs a pass over the lots. This is what an IRS
+# capital-gains rule can be built on, even after a long game of frequent trading.
+
+import numpy as np
+
+LOT = np.dtype([("id", np.int64), ("turn", np.int32), ("shares", np.int64), ("price", np.float64)])
+METHODS = ("fifo", "lifo")  # or pass the lot ids to sell from
+
+
+class TickerLots:
+    def __init__(self, capacity=16):
+        self.rows = np.zeros(capacity, dtype=LOT)
+        self.head = 0  # rows before head are used up
+        self.tail = 0  # rows from tail on are empty
+        self.next_id = 0  # ids only ever go up, so an old id can never point at a newer lot
+        self.shares = 0
+        self.cost = 0.0
+
+    def add(self, turn, shares, price):
+        if self.tail == len(self.rows):
+            live = self.rows[self.head:self.tail]
+            if self.head >= len(self.rows) // 2:
+                self.rows[:len(live)] = live  # reuse the used-up space at the front
+            else:
+                grown = np.zeros(len(self.rows) * 2, dtype=LOT)
+                grown[:len(live)] = live
+                self.rows = grown
+            self.tail -= self.head
+            self.head = 0
+        lot_id = self.next_id
+        self.next_id += 1
+        self.rows[self.tail] = (lot_id, turn, shares, price)
+        self.tail += 1
+        self.shares += shares
+        self.cost += shares * price
+        return lot_id
+
+    def find(self, lot_id):
+        # Row of an open lot, or None; rows are kept in id order so this is a binary search
+        ids = self.rows["id"][self.head:self.tail]
+        i = int(np.searchsorted(ids, lot_id))
+        if i < len(ids) and ids[i] == lot_id and self.rows["shares"][self.head + i]:
+            return self.head + i
+        return None
+
+    def take(self, i, shares):
+        # Remove up to `shares` from row i; returns (shares taken, their cost)
+        taken = min(shares, int(self.rows["shares"][i]))
+        self.rows["shares"][i] -= taken
+        return taken, taken * float(self.rows["price"][i])
+
+    def relieve(self, shares, method="fifo", lot_ids=None):
+        # Take `shares` off the lots; returns their cost basis
+        if shares > self.shares:
+            raise ValueError("Not enough shares in the lots")
+        remaining = shares
+        cost = 0.0
+        if lot_ids is not None:
+            rows = [self.find(lot_id) for lot_id in lot_ids]
+            if None in rows or sum(int(self.rows["shares"][i]) for i in set(rows)) < shares:
+                raise ValueError("Those lots don't hold enough shares!")
+            for i in rows:
+                if not remaining:
+                    break
+                taken, taken_cost = self.take(i, remaining)
+                remaining -= taken
+                cost += taken_cost
+        elif method == "fifo":
+            while remaining:
+                taken, taken_cost = self.take(self.head, remaining)
+                remaining -= taken
+                cost += taken_cost
+                if self.rows[self.head]["shares"] == 0:
+                    self.head += 1
+        elif method == "lifo":
+            while remaining:
+                taken, taken_cost = self.take(self.tail - 1, remaining)
+                remaining -= taken
+                cost += taken_cost
+                if self.rows[self.tail - 1]["shares"] == 0:
+                    self.tail -= 1
+        else:
+            raise ValueError(f"Unknown lot method: {method}")
+        # Step past lots emptied from the ends (specific-lot sells can leave holes in between)
+        while self.head < self.tail and self.rows[self.head]["shares"] == 0:
+            self.head += 1
+        while self.tail > self.head and self.rows[self.tail - 1]["shares"] == 0:
+            self.tail -= 1
+        self.shares -= shares
+        self.cost = self.cost - cost if self.shares else 0.0
+        return cost
+
+
+class LotLedger:
+    def __init__(self, names):
+        self.tickers = {name: TickerLots() for name in names}
+        self.realized = {name: 0.0 for name in names}  # realized gain per ticker
+
+    def buy(self, stock, turn, shares, price):
+        # Returns the new lot's id (for selling that lot specifically later)
+        return self.tickers[stock].add(turn, shares, price)
+
+    def sell(self, stock, shares, price, method="fifo", lot_ids=None):
+        # Returns the realized gain; raises ValueError (and changes nothing) if the shares
+        # aren't there
+        cost = self.tickers[stock].relieve(shares, method, lot_ids)
+        gain = shares * price - cost
+        self.realized[stock] += gain
+        return gain
+
+    def shares(self, stock):
+        return self.tickers[stock].shares
+
+    def average_price(self, stock):
+        lots = self.tickers[stock]
+        return lots.cost / lots.shares if lots.shares else 0.0
+
+    def lots(self, stock):
+        # The open lots as a read-only array of (id, turn, shares, price) rows
+        lots = self.tickers[stock]
+        rows = lots.rows[lots.head:lots.tail]
+        view = rows[rows["shares"] > 0]
+        view.setflags(write=False)
+        return view
+
+    def realized_total(self):
+        return sum(self.realized.values())
+
+
+if __name__ == "__main__":
+    # Lot ids must never be handed out twice, even after the newest lot is sold off
+    lots = TickerLots()
+    first = lots.add(1, 10, 5.0)
+    second = lots.add(2, 10, 6.0)
+    lots.relieve(10, "lifo")
+    third = lots.add(3, 10, 7.0)
+    assert third not in (first, second), "lot id reused"
+    try:
+        lots.relieve(5, lot_ids=[second])
+        raise AssertionError("sold out of a lot that is already gone")
+    except ValueError:
+        pass
+    assert lots.relieve(5, lot_ids=[third]) == 35.0
+    # Ids survive the array being compacted and grown
+    ids = [lots.add(4 + i, 1, 1.0) for i in range(40)]
+    lots.relieve(20, "fifo")
+    assert lots.find(ids[-1]) is not None and lots.rows["id"][lots.find(ids[-1])] == ids[-1]
+    print("lot checks passed")
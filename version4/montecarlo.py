@@ -0,0 +1,119 @@
+# Plays many complete games without a window, spread over all CPU cores, to see how the
+# economy tables play out: how much cash people end with, how high the IRS bar gets, how
+# many recessions hit. Every game's seed comes from one master seed, so a whole batch (or
+# any single game in it, via its "seed") can be replayed exactly.
+#
+#   python montecarlo.py --games 10000 --seed 1 --policy buy_and_hold
+
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from engine import StockMarketSim
+
+GAME_LENGTH = 2167  # 500 months of weekly turns
+
+
+# Player policies. Each is called with the game every `every` turns and may buy or sell.
+# They have to be plain module-level functions so worker processes can find them.
+def do_nothing(game):
+    pass
+
+
+def buy_and_hold(game):
+    # Spend all the cash on an equal split of every stock the first time round
+    if game.portfolio:
+        return
+    budget = game.cash / len(game.stocks)
+    for stock in game.stocks:
+        game.selected_stock = stock.name
+        game.buy_stock(int(budget // stock.price))
+
+
+POLICIES = {"none": do_nothing, "buy_and_hold": buy_and_hold}
+
+
+def play_game(job):
+    index, seed, policy_name, turns, every, fast = job
+    policy = POLICIES[policy_name]
+    game = StockMarketSim(seed=seed, history_window=64, fast_forward=fast)
+    while game.turn <= turns and not game.is_game_over():
+        policy(game)
+        game.step(min(every, turns + 1 - game.turn))
+
+    holdings = game.valuation.market_value
+    return {
+        "game": index,
+        "seed": seed,
+        "turns": game.turn - 1,
+        "cash": game.cash,
+        "holdings": holdings,
+        "net_worth": game.cash + holdings,
+        "irs_percentage": game.irs_percentage,
+        "game_over": game.is_game_over(),
+        "investors": len(game.investors),
+        "recessions": sum(game.recession_counts.values()),
+        "recession_counts": dict(game.recession_counts),
+    }
+
+
+def game_seeds(master_seed, games):
+    return [int(seed) for seed in np.random.SeedSequence(master_seed).generate_state(games, dtype=np.uint64)]
+
+
+def run_games(games, master_seed, policy="none", turns=GAME_LENGTH, every=52, processes=None, fast=False):
+    # Yields one summary per game as soon as it finishes (not in game order). fast skips quiet
+    # turns in blocks, which drifts a little from the real game's prices (see Market.advance)
+    jobs = [(i, seed, policy, turns, every, fast) for i, seed in enumerate(game_seeds(master_seed, games))]
+    if processes == 1:
+        yield from map(play_game, jobs)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(play_game, jobs, chunksize=max(1, games // (64 * (processes or 1))))
+
+
+def aggregate(summaries):
+    summaries = sorted(summaries, key=lambda summary: summary["game"])
+    result = {"games": len(summaries)}
+    for field in ("net_worth", "cash", "holdings", "irs_percentage", "investors", "recessions"):
+        values = np.array([summary[field] for summary in summaries], dtype=np.float64)
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        result[field] = {"mean": values.mean(), "std": values.std(), "p5": p5, "median": p50, "p95": p95}
+    result["game_over_rate"] = np.mean([summary["game_over"] for summary in summaries])
+    kinds = sorted({kind for summary in summaries for kind in summary["recession_counts"]})
+    result["recessions_per_game"] = {kind: np.mean([summary["recession_counts"].get(kind, 0) for summary in summaries])
+                                     for kind in kinds}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless games and summarize the outcomes")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="master seed for the whole batch")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="none")
+    parser.add_argument("--turns", type=int, default=GAME_LENGTH)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--fast", action="store_true", help="fast-forward quiet turns (prices drift slightly)")
+    args = parser.parse_args()
+
+    summaries = []
+    for summary in run_games(args.games, args.seed, args.policy, args.turns, processes=args.processes,
+                             fast=args.fast):
+        summaries.append(summary)
+        if len(summaries) % max(1, args.games // 10) == 0:
+            print(f"{len(summaries)}/{args.games} games done")
+
+    result = aggregate(summaries)
+    print(f"\n{result['games']} games, policy {args.policy!r}, master seed {args.seed}")
+    for field in ("net_worth", "cash", "holdings", "irs_percentage", "investors", "recessions"):
+        stats = result[field]
+        print(f"{field:>15}: mean {stats['mean']:>14,.2f}  median {stats['median']:>14,.2f}  "
+              f"5%-95% {stats['p5']:,.2f} .. {stats['p95']:,.2f}")
+    print(f"{'game over':>15}: {result['game_over_rate']:.1%}")
+    for kind, count in result["recessions_per_game"].items():
+        print(f"{kind:>15}: {count:.2f} per game")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Resting orders: limit buys, limit sells, stop-losses and take-profits.
+# Each ticker has two heaps sorted by trigger price: orders that fire when the price falls to
+# their level (limit buys, stop-losses) and orders that fire when it rises to it (limit sells,
+# take-profits). The best trigger on each side is also kept in an array across all tickers,
+# so one comparison tells which books a price move reached, and only the levels it actually
+# crossed get popped. Orders the price doesn't reach cost nothing that turn.
+
+import heapq
+import itertools
+
+import numpy as np
+
+# kind -> (side, fires when the price is at or ... the trigger)
+ORDER_KINDS = {
+    "limit buy": ("buy", "below"),
+    "limit sell": ("sell", "above"),
+    "stop loss": ("sell", "below"),
+    "take profit": ("sell", "above"),
+}
+
+
+class Order:
+    def __init__(self, order_id, ticker, kind, shares, trigger, turn):
+        self.id = order_id
+        self.ticker = ticker
+        self.kind = kind
+        self.side, self.direction = ORDER_KINDS[kind]
+        self.shares = shares
+        self.trigger = trigger
+        self.turn = turn  # when it was placed
+        self.active = True  # cancelled and filled orders are dropped from the heaps lazily
+
+
+class OrderBook:
+    def __init__(self, names):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.below = [[] for _ in self.names]  # heaps of (-trigger, id, order): highest trigger on top
+        self.above = [[] for _ in self.names]  # heaps of (trigger, id, order): lowest trigger on top
+        self.best_below = np.full(len(self.names), -np.inf)
+        self.best_above = np.full(len(self.names), np.inf)
+        self.orders = {}  # order id -> Order, open orders only
+        self.ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __iter__(self):
+        return iter(list(self.orders.values()))
+
+    def place(self, ticker, kind, shares, trigger, turn=0):
+        if kind not in ORDER_KINDS:
+            raise ValueError(f"Unknown order kind: {kind}")
+        if ticker not in self.index:
+            raise ValueError(f"Unknown ticker: {ticker}")
+        i = self.index[ticker]
+        order = Order(next(self.ids), ticker, kind, shares, trigger, turn)
+        self.orders[order.id] = order
+        if order.direction == "below":
+            heapq.heappush(self.below[i], (-trigger, order.id, order))
+        else:
+            heapq.heappush(self.above[i], (trigger, order.id, order))
+        self.update_best(i)
+        return order
+
+    def cancel(self, order_id):
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+        order.active = False
+        self.update_best(self.index[order.ticker])
+        return True
+
+    def update_best(self, i):
+        below, above = self.below[i], self.above[i]
+        while below and not below[0][2].active:
+            heapq.heappop(below)
+        while above and not above[0][2].active:
+            heapq.heappop(above)
+        self.best_below[i] = -below[0][0] if below else -np.inf
+        self.best_above[i] = above[0][0] if above else np.inf
+
+    def crossed(self, prices):
+        # Indices of the tickers whose price reached at least one trigger
+        return np.flatnonzero((prices <= self.best_below) | (prices >= self.best_above))
+
+    def first_crossing(self, path):
+        # Row of the first turn in a (turns, tickers) block of prices that reaches any trigger,
+        # or None; lets Market.advance stop there instead of skipping past a fill
+        hit = ((path <= self.best_below) | (path >= self.best_above)).any(axis=1)
+        rows = np.flatnonzero(hit)
+        return int(rows[0]) if len(rows) else None
+
+    def match(self, prices):
+        # Takes every order triggered at these prices off the book and returns them, best
+        # trigger first within each ticker
+        triggered = []
+        for i in self.crossed(prices).tolist():
+            price = prices[i]
+            below, above = self.below[i], self.above[i]
+            while below and -below[0][0] >= price:
+                triggered.append(heapq.heappop(below)[2])
+            while above and above[0][0] <= price:
+                triggered.append(heapq.heappop(above)[2])
+            self.update_best(i)
+        triggered = [order for order in triggered if order.active]
+        for order in triggered:
+            order.active = False
+            del self.orders[order.id]
+        return triggered
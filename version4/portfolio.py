@@ -0,0 +1,80 @@
+# Running valuation of the player's holdings.
+# Positions are kept as arrays lined up with the Market's tickers. A trade only updates its
+# own position, and the market value and profit / loss of everything are worked out again
+# once after prices move (the Market counts its price ticks). Everything else just reads the
+# cached numbers, however many times a frame it asks.
+
+import numpy as np
+
+
+class Valuation:
+    def __init__(self, market):
+        self.market = market
+        count = len(market)
+        self.shares_held = np.zeros(count, dtype=np.int64)
+        self.cost = np.zeros(count)  # what the shares held cost, at the average buy price
+        self.value = np.zeros(count)  # shares held * current price
+        self.pnl = np.zeros(count)  # value - cost
+        self.percent = np.zeros(count)  # return on each position since it was bought
+        self.totals = (0.0, 0.0)  # (market value, unrealized P&L)
+        self.ticks = -1  # market tick the cache was worked out at
+
+    def set_position(self, stock, shares, avg_price):
+        # Call after every trade with the new position; only this position is recomputed
+        i = self.market.index[stock]
+        price = self.market.prices[i]
+        self.shares_held[i] = shares
+        self.cost[i] = shares * avg_price
+        old_value, old_pnl = self.value[i], self.pnl[i]
+        self.value[i] = shares * price
+        self.pnl[i] = self.value[i] - self.cost[i]
+        self.percent[i] = (price - avg_price) / avg_price * 100 if shares and avg_price else 0
+        if self.ticks == self.market.ticks:
+            value, pnl = self.totals
+            self.totals = (value + self.value[i] - old_value, pnl + self.pnl[i] - old_pnl)
+
+    def refresh(self):
+        # Revalue every position if prices have moved since last time
+        if self.ticks == self.market.ticks:
+            return
+        prices = self.market.prices
+        np.multiply(self.shares_held, prices, out=self.value)
+        np.subtract(self.value, self.cost, out=self.pnl)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = self.pnl / self.cost * 100
+        np.copyto(self.percent, np.where(self.cost > 0, percent, 0.0))
+        self.totals = (float(self.value.sum()), float(self.pnl.sum()))
+        self.ticks = self.market.ticks
+
+    @property
+    def market_value(self):
+        self.refresh()
+        return self.totals[0]
+
+    @property
+    def unrealized_pnl(self):
+        self.refresh()
+        return self.totals[1]
+
+    def shares(self):
+        return self.read_only(self.shares_held)
+
+    def values(self):
+        self.refresh()
+        return self.read_only(self.value)
+
+    def returns(self):
+        # % return of each position, 0 where nothing is held
+        self.refresh()
+        return self.read_only(self.percent)
+
+    def position(self, stock):
+        # (shares, price, value, % return) for one ticker
+        self.refresh()
+        i = self.market.index[stock]
+        return int(self.shares_held[i]), float(self.market.prices[i]), float(self.value[i]), float(self.percent[i])
+
+    def read_only(self, array):
+        view = array.view()
+        view.setflags(write=False)
+        return view
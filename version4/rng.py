@@ -0,0 +1,57 @@
+# Random numbers for the simulation.
+# Each subsystem (prices, economy changes, recessions, investors) gets its own stream, all
+# derived from one seed, so a game can be replayed exactly and one subsystem drawing more or
+# fewer numbers doesn't shift what every other subsystem sees. Single draws are served from a
+# block of numbers NumPy generates in one go, so they cost about as much as a list lookup.
+
+import zlib
+
+import numpy as np
+
+
+class Stream:
+    def __init__(self, generator, block_size=4096):
+        self.generator = generator  # use directly for array draws
+        self.block_size = block_size
+        self.block = []
+        self.pos = 0
+
+    def random(self):
+        # A float in [0, 1)
+        if self.pos == len(self.block):
+            self.block = self.generator.random(self.block_size).tolist()
+            self.pos = 0
+        value = self.block[self.pos]
+        self.pos += 1
+        return value
+
+    def uniform(self, low, high):
+        return low + (high - low) * self.random()
+
+    def randint(self, low, high):
+        # Like random.randint: both ends included
+        return low + int(self.random() * (high - low + 1))
+
+    def choice(self, options):
+        return options[int(self.random() * len(options))]
+
+    def array(self, size):
+        # Floats in [0, 1) as a NumPy array, straight from the generator
+        return self.generator.random(size)
+
+
+class RngService:
+    def __init__(self, seed=None):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.seed = self.seed_sequence.entropy  # pass this back in to replay the same game
+        self.streams = {}
+
+    def stream(self, name):
+        # The same name always gets the same numbers for a given seed
+        if name not in self.streams:
+            child = np.random.SeedSequence(self.seed, spawn_key=(zlib.crc32(name.encode()),))
+            self.streams[name] = Stream(np.random.Generator(np.random.PCG64(child)))
+        return self.streams[name]
+
+    def generator(self, name):
+        return self.stream(name).generator
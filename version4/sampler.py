@@ -0,0 +1,74 @@
+# Weighted random choice between a fixed set of outcomes, used by everything in the game that
+# rolls for one of several results (economy changes, recessions, ...). The weights are declared
+# as a table and compiled once, so the odds can be printed and tested, and a whole array of
+# uniform draws can be turned into outcomes at once.
+
+import bisect
+
+import numpy as np
+
+
+class CumulativeSampler:
+    def __init__(self, weights):
+        # weights: {outcome: weight}; weights don't need to add up to anything in particular
+        self.outcomes = list(weights)
+        self.weights = np.array([weights[outcome] for outcome in self.outcomes], dtype=np.float64)
+        if (self.weights < 0).any() or self.weights.sum() <= 0:
+            raise ValueError("Weights must be non-negative and not all zero")
+        self.cumulative = np.cumsum(self.weights) / self.weights.sum()
+        self.cumulative[-1] = 1.0  # make sure rounding can't leave a gap at the top
+        self.cumulative.setflags(write=False)
+        self.cumulative_list = self.cumulative.tolist()
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def probabilities(self):
+        return dict(zip(self.outcomes, (self.weights / self.weights.sum()).tolist()))
+
+    def index(self, u):
+        # Outcome index for one uniform number in [0, 1)
+        return bisect.bisect_right(self.cumulative_list, u)
+
+    def indices(self, u):
+        # Outcome indices for an array of uniform numbers in [0, 1)
+        return np.searchsorted(self.cumulative, u, side="right")
+
+    def draw(self, stream):
+        return self.outcomes[self.index(stream.random())]
+
+
+# Walker's alias method: the same odds, but every draw is O(1) however many outcomes there
+# are. Each of the n columns holds its own outcome and one "alias"; a uniform number picks a
+# column with its whole part and chooses between the two with its fractional part.
+class AliasSampler(CumulativeSampler):
+    def __init__(self, weights):
+        super().__init__(weights)
+        count = len(self.outcomes)
+        scaled = (self.weights / self.weights.sum() * count).tolist()
+        prob = [1.0] * count
+        alias = list(range(count))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s], alias[s] = scaled[s], l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+        # Anything left over is 1 up to rounding error and keeps prob 1
+        self.prob = np.array(prob)
+        self.alias = np.array(alias)
+        self.prob.setflags(write=False)
+        self.alias.setflags(write=False)
+        self.prob_list = prob
+        self.alias_list = alias
+
+    def index(self, u):
+        u *= len(self.prob_list)
+        column = int(u)
+        return column if u - column < self.prob_list[column] else self.alias_list[column]
+
+    def indices(self, u):
+        u = np.asarray(u) * len(self.prob)
+        column = u.astype(np.intp)
+        return np.where(u - column < self.prob[column], column, self.alias[column])
@@ -0,0 +1,81 @@
+# Retained-mode drawing for the game window.
+# The screen is split into panels. Each panel has a key function that returns whatever its
+# picture depends on (prices, cash, the scroll position, ...). Only panels whose key changed
+# since the last frame get redrawn, and only their rectangles are sent to the display, so a
+# frame where nothing changed costs almost nothing.
+
+import pygame
+
+_NEVER = object()  # key a panel has before it is drawn the first time
+
+
+class Panel:
+    # rect: the area the panel draws in (drawing is clipped to it)
+    # draw: called with no arguments to draw the panel onto the screen
+    # key: called every frame; the panel is redrawn whenever the result changes
+    # visible: called every frame; hidden panels are cleared and not drawn
+    def __init__(self, rect, draw, key=lambda: None, visible=lambda: True):
+        self.rect = pygame.Rect(rect)
+        self.draw = draw
+        self.key = key
+        self.visible = visible
+        self.last_key = _NEVER
+        self.shown = False
+
+
+class Scene:
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.panels = []  # in drawing order, back to front
+        self.full_redraw = True
+
+    def add(self, panel):
+        self.panels.append(panel)
+        return panel
+
+    def invalidate(self):
+        # Force everything to be redrawn next frame
+        self.full_redraw = True
+
+    def render(self):
+        dirty = []
+        for panel in self.panels:
+            visible = panel.visible()
+            key = panel.key() if visible else None
+            if visible != panel.shown or (visible and key != panel.last_key):
+                dirty.append(panel)
+            panel.shown = visible
+            panel.last_key = key
+        if self.full_redraw:
+            self.full_redraw = False
+            self.screen.fill(self.background)
+            dirty = [panel for panel in self.panels if panel.shown]
+            self.draw(dirty)
+            pygame.display.flip()
+            return [self.screen.get_rect()]
+        if not dirty:
+            return []
+
+        # Clearing a panel's rect wipes whatever overlaps it, so those panels need drawing too
+        changed = True
+        while changed:
+            changed = False
+            for panel in self.panels:
+                if panel.shown and panel not in dirty and panel.rect.collidelist([p.rect for p in dirty]) != -1:
+                    dirty.append(panel)
+                    changed = True
+
+        rects = [panel.rect for panel in dirty]
+        for rect in rects:
+            self.screen.fill(self.background, rect)
+        self.draw(dirty)
+        pygame.display.update(rects)
+        return rects
+
+    def draw(self, dirty):
+        for panel in self.panels:
+            if panel in dirty and panel.shown:
+                self.screen.set_clip(panel.rect)
+                panel.draw()
+        self.screen.set_clip(None)
@@ -0,0 +1,38 @@
+# Turn-based event scheduler.
+# Instead of every subsystem counting a timer down by one each turn and checking it, each one
+# says which turn it next needs to run on. The engine then only has to look at the front of
+# one priority queue, and can jump straight over the quiet turns in between.
+
+import heapq
+import itertools
+
+
+class Scheduler:
+    def __init__(self):
+        self.queue = []  # [turn, priority, order, action]
+        self.order = itertools.count()  # keeps same-turn, same-priority events first come first served
+
+    def __len__(self):
+        return sum(1 for entry in self.queue if entry[3] is not None)
+
+    def schedule(self, turn, action, priority=0):
+        # action(turn) is called once the engine reaches `turn`; lower priorities run first
+        entry = [turn, priority, next(self.order), action]
+        heapq.heappush(self.queue, entry)
+        return entry
+
+    def cancel(self, entry):
+        entry[3] = None  # dropped when it reaches the front of the queue
+
+    def next_turn(self, default=None):
+        while self.queue and self.queue[0][3] is None:
+            heapq.heappop(self.queue)
+        return self.queue[0][0] if self.queue else default
+
+    def run_due(self, turn):
+        # Runs everything scheduled for `turn` or earlier, including anything those actions
+        # schedule for this same turn
+        while self.queue and self.queue[0][0] <= turn:
+            action = heapq.heappop(self.queue)[3]
+            if action is not None:
+                action(turn)
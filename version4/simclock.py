@@ -0,0 +1,29 @@
+# Fixed-timestep clock for the simulation.
+# The game should run at the same number of turns per real second however fast the window
+# draws. Each frame we add the real time that passed to an accumulator and run one turn for
+# every whole turn's worth of time in it. If a frame took so long that we would have to run
+# a huge batch of turns to catch up (which would make the next frame slow too, and so on),
+# the extra time is dropped instead and the game just runs a little slower for a moment.
+
+class SimClock:
+    def __init__(self, turns_per_second=15, max_turns_per_frame=8):
+        self.turns_per_second = turns_per_second
+        self.max_turns_per_frame = max_turns_per_frame
+        self.accumulator = 0.0  # seconds of simulation time not yet run
+        self.dropped = 0  # turns skipped by the catch-up limit, for debugging
+
+    def advance(self, seconds):
+        # Returns how many turns to run for `seconds` of real time
+        self.accumulator += seconds
+        turns = int(self.accumulator * self.turns_per_second)
+        if turns > self.max_turns_per_frame:
+            self.dropped += turns - self.max_turns_per_frame
+            turns = self.max_turns_per_frame
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= turns / self.turns_per_second
+        return turns
+
+    def reset(self):
+        # Call while paused so time spent paused isn't made up afterwards
+        self.accumulator = 0.0
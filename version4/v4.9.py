@@ -1,13 +1,14 @@
 import pygame
-import random
-import matplotlib.pyplot as plt
 from event import *
+from engine import StockMarketSim
+from chart import LineChart, MplChart
+from textcache import TextCache
+from scene import Panel, Scene
+from simclock import SimClock
 import time
-from io import BytesIO
 
 # Initialize Pygame
 pygame.init()
-plt.style.use("fast")
 
 # Screen setup
 WIDTH, HEIGHT = 1000, 700
@@ -24,9 +25,13 @@ GRAY = (200, 200, 200)
 
 textScroll = WIDTH
 
+# "pygame" draws the chart natively, "matplotlib" uses the old matplotlib look
+GRAPH_BACKEND = "pygame"
+
 # Fonts
 font = pygame.font.Font(None, 36)
 small_font = pygame.font.Font(None, 24)
+text_cache = TextCache()  # most strings are identical from frame to frame
 
 
 # Input box for typing in stock numbers
@@ -74,7 +79,7 @@ class Button:
 
     def draw(self):
         pygame.draw.rect(screen, self.color, self.rect)
-        text_surface = font.render(self.text, True, BLACK)
+        text_surface = text_cache.render(font, self.text, BLACK)
         screen.blit(text_surface, (self.rect.x + (self.rect.width - text_surface.get_width()) // 2,
                                    self.rect.y + (self.rect.height - text_surface.get_height()) // 2))
 
@@ -82,57 +87,13 @@ class Button:
         return self.rect.collidepoint(pos)
 
 
-class Stock:
-    def __init__(self, name):
-        self.name = name
-        self.price = random.randint(20, 300)
-        self.low = -2
-        self.high = 3
-        self.economy = "Standard"  # or upturn, or downturn
-
-    def updateLowHigh(self):
-        settings = {
-            "Bad Standard": (-0.45, 0.375),
-            "Good Standard": (-0.025, 0.65),
-            "Standard": (-0.05, 0.35),
-            "Great Upturn": (-0.015, 1.657285),
-            "Ok Upturn": (-0.025, 1.285),
-            "Upturn": (-0.05, 0.785),
-            "Downturn": (-0.005, -1.25),
-            "Good Downturn": (-0.005, -0.7225),
-            "Bank Account == Cooked": (-0.35, -2.25),
-            "TO THE SKY": (0.5, 4.25),
-            "Geopolitical Tensions": (-0.5, -0.55),
-            "Medium": (-0.005, 0.005)
-        }
-        current_setting = settings[self.economy]
-        self.low = current_setting[0]
-        self.high = current_setting[1]
-
-
 # StockMarketGame class with graph integration
-class StockMarketGame:
+# The rules live in engine.py; this class only adds the drawing on top
+class StockMarketGame(StockMarketSim):
     def __init__(self):
-        self.cash = 10000
-        self.portfolio = {}
-        self.avg_buy_price = {}
-        self.stocks = [Stock("Steel"), Stock("Tech"), Stock("Food"), Stock("Gold"), Stock("Aviation"), Stock("Cars")]
-        self.historical_prices = {stock.name: [stock.price] for stock in self.stocks}
-        self.turn = 1
-        self.irs_percentage = 0
-        self.selected_stock = None
-        self.message = ""  # Add a message attribute
+        super().__init__(verbose=True)
         self.message_surface = font.render(self.message, True, BLACK)
-        self.recession_timer = random.randint(360, 480)  # Initialize the recession timer
-        self.economy_status_timer = random.randint(30, 40)
-
-        # Investor-related attributes
-        self.investors = {}  # {investor_name: (initial_investment, start_turn)}
-        self.investor_names = ["Alice", "Bob", "Charlie", "David", "Eve", "Frank"]  # List of investor names
-        self.investor_arrival_timer = random.randint(50, 150)  # Time until next investor arrives
-        self.base_investment_amount = 10000  # Base investment amount
-        self.max_investors = 5  # Maximum number of investors allowed
-        self.percentage = 0
+        self.chart = MplChart(550, 300) if GRAPH_BACKEND == "matplotlib" else LineChart(550, 300)
 
     def display_market(self):
         y_offset = 50
@@ -140,281 +101,66 @@ class StockMarketGame:
             stock = s.name
             price = s.price
             stock_text = f"{stock}: ${price:.2f}"
-            stock_surface = font.render(stock_text, True, BLACK)
+            stock_surface = text_cache.render(font, stock_text, BLACK)
             screen.blit(stock_surface, (50, y_offset))
             y_offset += 40
 
     def display_portfolio(self):
         y_offset = 300
         portfolio_text = "Your Portfolio:"
-        portfolio_surface = font.render(portfolio_text, True, BLACK)
+        portfolio_surface = text_cache.render(font, portfolio_text, BLACK)
         screen.blit(portfolio_surface, (50, y_offset))
         y_offset += 40
 
         balance_text = f"You have ${self.cash:.2f} in your bank account."
-        balance_surface = small_font.render(balance_text, True, BLACK)
+        balance_surface = text_cache.render(small_font, balance_text, BLACK)
         screen.blit(balance_surface, (50, y_offset))
         y_offset += 30
 
-        for stock, shares in self.portfolio.items():
-            value = shares * self.findStockPrice(stock)
-            percent_change = self.get_percent_change(stock)
+        for stock in self.portfolio:
+            shares, price, value, percent_change = self.valuation.position(stock)
             color = GREEN if percent_change >= 0 else RED
             percent_text = f"{percent_change:+.2f}%"
             # Render the main text (black)
-            main_text = f"{stock}: {shares} shares @ ${self.findStockPrice(stock):.2f} (${value:.2f}) "
-            main_surface = small_font.render(main_text, True, BLACK)
+            main_text = f"{stock}: {shares} shares @ ${price:.2f} (${value:.2f}) "
+            main_surface = text_cache.render(small_font, main_text, BLACK)
             screen.blit(main_surface, (50, y_offset))
             # Render the percent text (green/red)
-            percent_surface = small_font.render(percent_text, True, color)
+            percent_surface = text_cache.render(small_font, percent_text, color)
             screen.blit(percent_surface, (50 + main_surface.get_width(), y_offset))
             y_offset += 30
 
         # Display investors
         investor_text = "Investors:"
-        investor_surface = font.render(investor_text, True, BLACK)
+        investor_surface = text_cache.render(font, investor_text, BLACK)
         screen.blit(investor_surface, (50, y_offset))
         y_offset += 40
 
-        for investor, (initial_investment, start_turn) in self.investors.items():
-            years_invested = (self.turn - start_turn) // 52  # Assuming 52 turns per year
-            owed_percentage = self.calculate_owed_percentage(years_invested)
-            owed_amount = initial_investment * (1 + owed_percentage)
+        for investor, owed_amount in self.investors.owed_amounts(self.turn):
             investor_info = f"{investor}: Owed ${owed_amount:.2f}"
-            investor_surface = small_font.render(investor_info, True, BLACK)
+            investor_surface = text_cache.render(small_font, investor_info, BLACK)
             screen.blit(investor_surface, (50, y_offset))
             y_offset += 30
 
-    def display_message(self):
+    def scroll_message(self):
         global textScroll
         textScroll -= 1
         if textScroll + (len(self.message) * 14) < 0:
             textScroll = WIDTH
-        self.message_surface = font.render(self.message, True, BLACK)
-        screen.blit(self.message_surface, (textScroll, HEIGHT - 50))
 
-    def buy_stock(self, shares_to_buy):
-        if not self.selected_stock:
-            self.message = "No stock selected!"
-            return
-
-        try:
-            shares_to_buy = int(shares_to_buy)
-            if shares_to_buy <= 0:
-                self.message = "Invalid number of shares!"
-                return
-        except ValueError:
-            self.message = "Invalid number of shares!"
-            return
-
-        stock_price = self.findStockPrice(self.selected_stock)
-        cost = shares_to_buy * stock_price
-
-        if cost > self.cash:
-            self.message = "Not enough cash!"
-            return
-
-        self.cash -= cost
-        prev_shares = self.portfolio.get(self.selected_stock, 0)
-        prev_total = self.avg_buy_price.get(self.selected_stock, 0) * prev_shares
-        new_total = prev_total + cost
-        new_shares = prev_shares + shares_to_buy
-        self.portfolio[self.selected_stock] = new_shares
-        self.avg_buy_price[self.selected_stock] = new_total / new_shares  # Update average price
-        self.message = f"Bought {shares_to_buy} shares of {self.selected_stock} for ${cost:.2f}"
-        self.portfolio[self.selected_stock] = self.portfolio.get(self.selected_stock, 0) + shares_to_buy
-
-    def findStockPrice(self, selected_stock):
-        for stock in self.stocks:
-            if stock.name == selected_stock:
-                return stock.price
-
-    def sell_stock(self, shares_to_sell):
-        if not self.selected_stock or self.selected_stock not in self.portfolio:
-            self.message = "No stock selected or no shares owned!"
-            return
-        try:
-            shares_to_sell = int(shares_to_sell)
-            if shares_to_sell <= 0:
-                self.message = "Invalid number of shares!"
-                return
-        except ValueError:
-            self.message = "Invalid number of shares!"
-            return
-
-        if shares_to_sell > self.portfolio[self.selected_stock]:
-            self.message = "Not enough shares to sell!"
-            return
-
-        selected_stock_price = self.findStockPrice(self.selected_stock)
-        revenue = shares_to_sell * selected_stock_price
-
-        self.cash += revenue
-        self.portfolio[self.selected_stock] -= shares_to_sell
-
-        if self.portfolio[self.selected_stock] == 0:
-            del self.portfolio[self.selected_stock]
-
-        self.message = f"Sold {shares_to_sell} shares of {self.selected_stock} for ${revenue:.2f}"
-
-    def hold(self, play):
-        if play:
-            for s in self.stocks:
-                stock = s.name
-                s.updateLowHigh()
-                change_percentage = random.uniform(s.low, s.high)
-                s.price *= (1 + change_percentage / 100)
-                s.price = max(1.0, round(s.price, 2))
-                self.historical_prices[stock].append(s.price)
-
-            self.turn += 1
-            self.check_recession()
-            self.check_eco_status()
-            self.handle_investors()
-
-    def check_eco_status(self):
-        self.economy_status_timer -= 1
-        if self.economy_status_timer <= 0:
-            for s in self.stocks:
-                self.ecoodds = random.randint(1, 100)
-                if self.ecoodds >= 1 and self.ecoodds <= 35:
-                    s.economy = "Standard"
-                if self.ecoodds >= 35 and self.ecoodds <= 45:
-                    s.economy = "Good Standard"
-                elif self.ecoodds > 45 and self.ecoodds <= 55:
-                    s.economy = "Bad Standard"
-                if self.ecoodds >= 55 and self.ecoodds <= 65:
-                    s.economy = "Great Upturn"
-                if self.ecoodds >= 55 and self.ecoodds <= 65:
-                    s.economy = "Ok Upturn"
-                elif self.ecoodds > 75 and self.ecoodds <= 82:
-                    s.economy = "Good Downturn"
-                if self.ecoodds >= 83 and self.ecoodds <= 86:
-                    s.economy = "Bank Account == Cooked"
-                if self.ecoodds >= 87 and self.ecoodds <= 89:
-                    s.economy = "TO THE SKY"
-                if self.ecoodds >= 90 and self.ecoodds <= 92:
-                    s.economy = "Geopolitical Tensions"
-                if self.ecoodds >= 93 and self.ecoodds <= 100:
-                    s.economy = "Medium"
-                print(f"{s.name}: {s.economy}")
-
-            self.economy_status_timer = random.randint(30, 40)
-
-    def get_percent_change(self, stock_name):
-        if stock_name not in self.avg_buy_price:
-            return 0
-        current_price = self.findStockPrice(stock_name)
-        avg_price = self.avg_buy_price[stock_name]
-        if avg_price == 0:
-            return 0
-        return ((current_price - avg_price) / avg_price) * 100
+    def display_message(self):
+        self.message_surface = text_cache.render(font, self.message, BLACK)
+        screen.blit(self.message_surface, (textScroll, HEIGHT - 50))
 
     def draw_graph(self):
         if not self.selected_stock:
             return None
+        # Only the turns added since the last call get drawn
+        return self.chart.update(self.historical_prices, self.selected_stock)
+
+    def display_graph(self):
+        screen.blit(self.draw_graph(), (200, 25))
 
-        plt.figure(figsize=(5.5, 3))
-        plt.plot(self.historical_prices[self.selected_stock], marker='o', linestyle='-', color='blue')
-        plt.title(f"{self.selected_stock} Stock Prices")
-        plt.xlabel("Weeks")
-        plt.ylabel("Price ($)")
-
-        buf = BytesIO()
-        plt.savefig(buf, format="webp")
-        buf.seek(0)
-
-        graph_surface = pygame.image.load(buf)
-
-        buf.close()
-        plt.close()
-
-        return graph_surface
-
-    def check_recession(self):
-        self.recession_timer -= 1
-        if self.recession_timer <= 0:
-            recession_type = "Fake"
-            odds = random.randint(1, 100)
-            if odds >= 1 and odds <= 5:
-                recession_type = "Fake"
-            elif odds > 5 and odds <= 80:
-                recession_type = "Stock Market Dip"
-            elif odds > 80 and odds <= 95:
-                recession_type = "Recession"
-            elif odds > 95 and odds <= 100:
-                recession_type = "Depression"
-            self.trigger_recession(recession_type)
-            self.recession_timer = random.randint(200, 300)  # Reset the timer
-
-    def trigger_recession(self, recession_type):
-
-        types = {
-            "Fake": (-1, 1),
-            "Stock Market Dip": (-3, -25),
-            "Recession": (-30, -40),
-            "Depression": (-50, -60)
-        }
-
-        settings = types[recession_type]
-        if recession_type == "Standard":
-            self.message = f"{recession_type} Occurs! Stock Prices Drop!"
-        elif recession_type == "Recession":
-            self.message = f"{recession_type} Hits! Stock Prices Drop!"
-        elif recession_type == "Depression":
-            self.message = f"{recession_type} Hits! Stock Prices Drop! (Emotional Damage... your bank account is worth as much as a cabbage)"
-        elif recession_type == "Fake":
-            self.message = f"Get trolled"
-
-        for stock in self.stocks:
-            # Apply a significant negative change to stock prices
-            change_percentage = random.uniform(settings[0], settings[1])
-            stock.price *= (1 + change_percentage / 100)
-            stock.price = max(1.0, round(stock.price, 2))
-
-    def handle_investors(self):
-        self.investor_arrival_timer -= 1
-        if self.investor_arrival_timer <= 0 and len(self.investors) < self.max_investors:
-            self.add_investor()
-            self.investor_arrival_timer = random.randint(10, 20)  # Reset timer
-
-        # Check for potential investor withdrawals
-        for investor, (initial_investment, start_turn) in list(self.investors.items()):
-            years_invested = (self.turn - start_turn) // 52  # Assuming 52 turns per year
-            owed_percentage = self.calculate_owed_percentage(years_invested)
-            owed_amount = initial_investment * (1 + owed_percentage)
-
-            # Chance of withdrawal increases with time
-            withdrawal_chance = years_invested * 0.01  # 1% increase per year
-
-            if random.random() < withdrawal_chance:
-                if self.cash >= owed_amount:
-                    self.cash -= owed_amount
-                    del self.investors[investor]
-                    self.message = f"{investor} withdrew ${owed_amount:.2f} after {years_invested} years."
-                    if self.irs_percentage - 1 < 0:
-                        self.irs_percentage = 0
-                    else:
-                        self.irs_percentage -= 1
-                else:
-                    self.message = f"Not enough cash to pay {investor}!"
-                    self.irs_percentage +=0.2
-
-    def add_investor(self):
-        available_investors = [name for name in self.investor_names if name not in self.investors]
-        if available_investors:
-            investor_name = random.choice(available_investors)
-            investment_amount = self.base_investment_amount * random.uniform(0.8, 1.5)  # Vary the amount
-            self.investors[investor_name] = (investment_amount, self.turn)
-            self.cash += investment_amount
-            self.message = f"{investor_name} invested ${investment_amount:.2f}!"
-
-    def calculate_owed_percentage(self, years):
-        if years >= 7:
-            return 1.40  # 80% after 5 years
-        elif years >= 5:
-            return 1.20  # 40% after 2 years
-        return 0  # No additional amount owed
     def irs_meter(self):
         global play, game_over
 
@@ -453,7 +199,7 @@ class StockMarketGame:
 
         # Draw text label
         text = "IRS DANGER BAR"
-        textInstance = font.render(text, True, END_COLOR)
+        textInstance = text_cache.render(font, text, END_COLOR)
         screen.blit(textInstance, (bar_x, bar_y - 25))
         
         # Draw main bar container
@@ -509,61 +255,73 @@ sell_button = Button(800, 200, 150, 50, "Sell")
 hold_button = Button(800, 300, 150, 50, "Play/Pause")
 quit_button = Button(800, 400, 150, 50, "Quit")
 close_graph_button = Button(400, 350, 150, 50, "Close Graph")
+speed_button = Button(800, 565, 150, 50, "Speed x1")
+
+# Fast-forward settings the speed button cycles through: (label, turns per second).
+# "Next Event" runs as fast as it can until something happens, then drops back to x1.
+SPEEDS = [("Speed x1", 15), ("Speed x10", 150), ("Speed x100", 1500), ("Next Event", None)]
+speed = 0
 
 # Input box
 input_box = InputBox(800, 50, 140, 32)
 play = False
 game_over = False
-start = True
-
-drawGraph = True
-drawGraphTimer = 0
-drawGraphTimerDEF = 5
 
-timer = 0
-timer_speed = 0.5
-timer_start = 1
+# Game speed is set in turns per real second, independent of the frame rate
+sim_clock = SimClock(turns_per_second=15)
+frame_time = 0.0
 clock = pygame.time.Clock()
+
+
+def set_speed(new_speed):
+    global speed
+    speed = new_speed
+    label, turns_per_second = SPEEDS[speed]
+    speed_button.text = label
+    if turns_per_second is not None:
+        sim_clock.turns_per_second = turns_per_second
+        sim_clock.max_turns_per_frame = max(8, turns_per_second // 15 * 2)  # a bit of catch-up room
+        sim_clock.reset()
+
+
 popup = True
+# Each panel is only redrawn when the things it shows change (see scene.py)
+scene = Scene(screen, WHITE)
+scene.add(Panel((40, 40, 330, 250), game_instance.display_market, key=lambda: game_instance.turn))
+scene.add(Panel((40, 290, 710, HEIGHT - 350), game_instance.display_portfolio,
+                key=lambda: (game_instance.turn, game_instance.cash, tuple(game_instance.portfolio.items()),
+                             tuple(game_instance.investors))))
+scene.add(Panel((745, 470, 215, 70), game_instance.display_irs_bar, key=lambda: game_instance.irs_percentage))
+scene.add(Panel((0, HEIGHT - 55, WIDTH, 45), game_instance.display_message,
+                key=lambda: (textScroll, game_instance.message)))
+for button in (buy_button, sell_button, hold_button, quit_button):
+    scene.add(Panel(button.rect, button.draw))
+scene.add(Panel(speed_button.rect, speed_button.draw, key=lambda: speed_button.text))
+scene.add(Panel((795, 45, WIDTH - 795, 42), lambda: input_box.draw(screen),
+                key=lambda: (input_box.text, tuple(input_box.color), input_box.rect.w)))
+scene.add(Panel((200, 25, 550, 300), game_instance.display_graph,
+                key=lambda: (game_instance.selected_stock, len(game_instance.historical_prices)),
+                visible=lambda: game_instance.selected_stock is not None))
+scene.add(Panel(close_graph_button.rect, close_graph_button.draw,
+                visible=lambda: game_instance.selected_stock is not None))
+
 while game_running:
-    screen.fill(WHITE)
-    if timer == 0:
-        game_instance.hold(play)
-        timer = timer_start
+    # All the turns for this frame run back to back; the panels only redraw once afterwards
+    if play and SPEEDS[speed][1] is None:
+        if game_instance.run_until_event(max_turns=200):
+            set_speed(0)
+    elif play:
+        game_instance.step(sim_clock.advance(frame_time))
     else:
-        timer -= 1
+        sim_clock.reset()
 
     if game_instance.irs_percentage < 100:
         game_instance.irs_percentage += 0.0
     game_instance.irs_meter()
-    game_instance.display_irs_bar()
+    game_instance.scroll_message()
     # if popup:
     #     popup = open_popup(screen, "Smelly")
 
-    # Display market and portfolio information
-    game_instance.display_market()
-    game_instance.display_portfolio()
-    game_instance.display_message()  # Display the message
-
-    # Draw buttons
-    buy_button.draw()
-    sell_button.draw()
-    hold_button.draw()
-    quit_button.draw()
-    input_box.draw(screen)
-
-    # Display graph if a stock is selected
-    if game_instance.selected_stock:
-        if play or start:
-            if drawGraphTimer > 0:
-                drawGraphTimer -= 1
-            else:
-                graph_surface = game_instance.draw_graph()
-                drawGraphTimer = drawGraphTimerDEF
-            start = False
-        screen.blit(graph_surface, (200, 25))
-        close_graph_button.draw()  # Draw the close graph button
-
     # Event handling
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -583,6 +341,8 @@ while game_running:
                 input_box.txt_surface = font.render(input_box.text, True, input_box.color)  # Update rendered text
             if hold_button.is_clicked(pos) and not game_over:
                 play = not play  # toggle play
+            if speed_button.is_clicked(pos) and not game_over:
+                set_speed((speed + 1) % len(SPEEDS))
             if quit_button.is_clicked(pos):
                 game_running = False
             # Determine selected stock
@@ -601,8 +361,8 @@ while game_running:
     # Update the input box
     input_box.update()
 
-    # Refresh screen
-    pygame.display.flip()
-    clock.tick(30)
+    # Redraw whatever changed and send just those rects to the display
+    scene.render()
+    frame_time = clock.tick(30) / 1000
 
 pygame.quit()